@@ -0,0 +1,132 @@
+"""
+Cópias de segurança online da base de dados SQLite.
+A cópia usa a API de backup do SQLite (sqlite3.Connection.backup) em pequenos passos de páginas,
+com uma pausa entre passos, e corre numa thread: os pontos continuam a ser gravados durante a cópia.
+Cada cópia é verificada (PRAGMA integrity_check), comprimida em gzip, e só as mais recentes são mantidas.
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+
+# Importa funções do nosso módulo database
+from database import get_read_connection
+# Importa configurações do nosso módulo config
+from config import BACKUP_DIR, BACKUP_RETENTION_COUNT, BACKUP_PAGES_PER_STEP, BACKUP_STEP_SLEEP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Extensão das cópias comprimidas e dos ficheiros ainda em construção
+BACKUP_SUFFIX = ".db.gz"
+TEMP_SUFFIX = ".tmp"
+
+class BackupError(Exception):
+    """A cópia não pôde ser feita ou não passou na verificação de integridade."""
+
+def _backup_prefix(db_path: str) -> str:
+    """Prefixo dos ficheiros de cópia: 'punch_card.db' -> 'punch_card-'."""
+    return os.path.splitext(os.path.basename(db_path))[0] + "-"
+
+def list_backups(db_path: str, backup_dir: str = BACKUP_DIR) -> list[str]:
+    """Caminhos das cópias existentes da base de dados, da mais antiga para a mais recente."""
+    if not os.path.isdir(backup_dir):
+        return []
+    prefix = _backup_prefix(db_path)
+    names = sorted(name for name in os.listdir(backup_dir) if name.startswith(prefix) and name.endswith(BACKUP_SUFFIX))
+    return [os.path.join(backup_dir, name) for name in names] # O nome tem a data (AAAAMMDD-HHMMSS): ordem alfabética = cronológica
+
+def _copy_database(db_path: str, target_path: str, pages_per_step: int, step_sleep: float) -> int:
+    """
+    Copia a base de dados página a página para 'target_path'. Retorna o número de páginas copiadas.
+    A leitura decorre numa única transação de leitura (snapshot WAL): as escritas de outras ligações
+    não bloqueiam nem obrigam a recomeçar a cópia.
+    """
+    copied_pages = 0
+
+    def progress(status, remaining, total):
+        nonlocal copied_pages
+        copied_pages = total - remaining
+        time.sleep(step_sleep) # Liberta o GIL (e o loop de eventos) entre passos
+
+    with closing(get_read_connection(db_path)) as source, closing(sqlite3.connect(target_path)) as target:
+        source.execute("BEGIN")
+        source.execute("SELECT count(*) FROM sqlite_master").fetchone() # Abre a transação de leitura (fixa o snapshot)
+        source.backup(target, pages=pages_per_step, progress=progress)
+        source.rollback()
+        # A cópia herda o modo WAL; em modo DELETE fica num único ficheiro (sem -wal/-shm ao abri-la)
+        target.execute("PRAGMA journal_mode=DELETE")
+    return copied_pages
+
+def _check_integrity(path: str):
+    """Executa PRAGMA integrity_check na cópia; levanta BackupError se não estiver íntegra."""
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    if problems != ["ok"]:
+        raise BackupError(f"Verificação de integridade falhou: {'; '.join(problems[:5])}")
+
+def _compress(source_path: str, target_path: str):
+    """Comprime 'source_path' em gzip para 'target_path' e força a escrita em disco."""
+    with open(source_path, 'rb') as source, open(target_path, 'wb') as raw_target:
+        with gzip.GzipFile(filename=os.path.basename(source_path), mode='wb', fileobj=raw_target) as target:
+            shutil.copyfileobj(source, target, length=1024 * 1024)
+        raw_target.flush()
+        os.fsync(raw_target.fileno())
+
+def apply_retention(db_path: str, backup_dir: str = BACKUP_DIR, keep: int = BACKUP_RETENTION_COUNT) -> list[str]:
+    """Apaga as cópias mais antigas, mantendo as 'keep' mais recentes. Retorna os caminhos apagados."""
+    backups = list_backups(db_path, backup_dir)
+    expired = backups[:-keep] if keep > 0 else []
+    for path in expired:
+        os.remove(path)
+    return expired
+
+def _remove_leftovers(db_path: str, backup_dir: str):
+    """Apaga ficheiros temporários de cópias interrompidas (ex.: o bot foi desligado a meio)."""
+    prefix = _backup_prefix(db_path)
+    for name in os.listdir(backup_dir):
+        if name.startswith(prefix) and TEMP_SUFFIX in name: # Inclui os -wal/-shm de uma cópia interrompida
+            os.remove(os.path.join(backup_dir, name))
+
+def create_backup(db_path: str, backup_dir: str = BACKUP_DIR, pages_per_step: int = BACKUP_PAGES_PER_STEP,
+                  step_sleep: float = BACKUP_STEP_SLEEP_SECONDS, keep: int = BACKUP_RETENTION_COUNT) -> dict:
+    """
+    Cria uma cópia comprimida e verificada de 'db_path' em 'backup_dir' e aplica a retenção.
+    Bloqueante: deve ser chamada fora do loop de eventos (ex.: asyncio.to_thread).
+    Retorna {'path', 'size_bytes', 'database_bytes', 'pages', 'duration_seconds', 'removed'}.
+    """
+    started = time.monotonic()
+    os.makedirs(backup_dir, exist_ok=True)
+    _remove_leftovers(db_path, backup_dir)
+
+    name = _backup_prefix(db_path) + datetime.now().strftime('%Y%m%d-%H%M%S')
+    snapshot_path = os.path.join(backup_dir, name + ".db" + TEMP_SUFFIX)
+    compressed_path = os.path.join(backup_dir, name + BACKUP_SUFFIX)
+    try:
+        pages = _copy_database(db_path, snapshot_path, pages_per_step, step_sleep)
+        _check_integrity(snapshot_path)
+        database_bytes = os.path.getsize(snapshot_path)
+        _compress(snapshot_path, compressed_path + TEMP_SUFFIX)
+        os.replace(compressed_path + TEMP_SUFFIX, compressed_path) # Só aparece como cópia quando está completa
+    except sqlite3.Error as e:
+        raise BackupError(f"Erro do SQLite durante a cópia: {e}") from e
+    finally:
+        for path in (snapshot_path, compressed_path + TEMP_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+
+    removed = apply_retention(db_path, backup_dir, keep)
+    result = {
+        'path': compressed_path,
+        'size_bytes': os.path.getsize(compressed_path),
+        'database_bytes': database_bytes,
+        'pages': pages,
+        'duration_seconds': time.monotonic() - started,
+        'removed': removed,
+    }
+    logger.info("Cópia de segurança %s criada: %d páginas, %d bytes comprimidos em %.2fs (%d antigas apagadas).",
+                compressed_path, pages, result['size_bytes'], result['duration_seconds'], len(removed))
+    return result
@@ -0,0 +1,132 @@
+import discord
+from discord.ext import commands, tasks
+from datetime import datetime
+import asyncio
+import logging
+import os
+
+# Cópias de segurança online da base de dados (API de backup do SQLite)
+from backup import BackupError, create_backup, list_backups
+# Importa o agendador persistente de tarefas
+from scheduler import DailyRule, JobScheduler, ScheduledJob
+# Importa configurações do nosso módulo config
+from config import BACKUP_HOUR, BACKUP_MINUTE, BACKUP_RETENTION_COUNT
+# Camada de armazenamento (backend escolhido no config.py)
+from storage import store
+
+logger = logging.getLogger(__name__)
+
+# Intents de que este cog precisa (ver gateway.declared_intents): comandos com prefixo
+REQUIRED_INTENTS = discord.Intents(guilds=True, guild_messages=True, message_content=True)
+
+# Nome da tarefa da cópia diária na tabela 'scheduled_jobs'
+BACKUP_JOB_NAME = "database_backup"
+# Intervalo com que o agendador verifica se a cópia está vencida (em segundos)
+SCHEDULER_TICK_SECONDS = 60
+
+def _format_size(size_bytes: int) -> str:
+    """Formata um tamanho em bytes (ex.: 1.7 MB)."""
+    for unit in ("B", "KB", "MB"):
+        if size_bytes < 1024:
+            return f"{size_bytes:.1f} {unit}" if unit != "B" else f"{size_bytes} B"
+        size_bytes /= 1024
+    return f"{size_bytes:.1f} GB"
+
+class BackupCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # Uma cópia de cada vez (a diária e as manuais partilham a pasta e a retenção)
+        self._backup_lock = asyncio.Lock()
+
+        # A cópia diária usa o mesmo agendador persistente do relatório semanal.
+        # Após uma paragem longa basta uma cópia: não se recuperam as execuções perdidas.
+        self.scheduler = JobScheduler(max_catchup_runs=1)
+        self.scheduler.add_job(ScheduledJob(BACKUP_JOB_NAME, DailyRule(BACKUP_HOUR, BACKUP_MINUTE), callback=self._scheduled_backup))
+        self.scheduler_task.start()
+        logger.info("BackupCog está pronto. Cópia diária agendada para as %02d:%02d.", BACKUP_HOUR, BACKUP_MINUTE)
+
+    def cog_unload(self):
+        """Garante que a tarefa em loop seja parada quando o cog é descarregado."""
+        self.scheduler_task.cancel()
+
+    # --- Reload a quente (ver hot_reload) ---
+    def export_state(self) -> dict:
+        """Estado entregue à nova versão do cog num !reload (o lock garante que as cópias não se sobrepõem)."""
+        return {'backup_lock': self._backup_lock, 'scheduler': self.scheduler.export_state()}
+
+    def import_state(self, state: dict):
+        self._backup_lock = state['backup_lock']
+        self.scheduler.import_state(state['scheduler'])
+
+    @tasks.loop(seconds=SCHEDULER_TICK_SECONDS)
+    async def scheduler_task(self):
+        # Protegido do cancelamento (unload/!reload): uma cópia agendada em curso termina sempre
+        await asyncio.shield(self.scheduler.run_pending())
+
+    @scheduler_task.before_loop
+    async def before_scheduler_task(self):
+        await self.bot.wait_until_ready() # Garante que o bot esteja pronto antes de iniciar a tarefa.
+
+    async def _run_backup(self) -> dict:
+        """
+        Cria uma cópia numa thread (a cópia cede o CPU entre passos, o loop de eventos nunca bloqueia).
+        Levanta BackupError se o armazenamento atual não for um ficheiro SQLite.
+        """
+        db_path = store.db_path
+        if db_path is None:
+            raise BackupError("O armazenamento atual não usa um ficheiro SQLite; não há nada para copiar.")
+        async with self._backup_lock:
+            return await asyncio.to_thread(create_backup, db_path)
+
+    async def _scheduled_backup(self, run_time: datetime):
+        """Callback do agendador: cópia diária."""
+        try:
+            await self._run_backup()
+        except Exception:
+            logger.exception("Erro na cópia de segurança agendada de %s.", run_time.strftime('%d/%m/%Y %H:%M'))
+
+    # --- Comandos Administrativos de Cópias de Segurança ---
+
+    @commands.group(name="backup", invoke_without_command=True, help="Lista as cópias de segurança da base de dados. Use !backup now para criar uma agora.")
+    @commands.has_permissions(administrator=True) # Apenas administradores podem usar
+    async def backup_group(self, ctx: commands.Context):
+        db_path = store.db_path
+        backups = list_backups(db_path) if db_path else []
+        if not backups:
+            await ctx.send("Ainda não há cópias de segurança. Use `!backup now` para criar uma.", ephemeral=True)
+            return
+        latest = backups[-1]
+        await ctx.send(
+            f"🗄️ {len(backups)} cópia(s) guardada(s) (retenção: {BACKUP_RETENTION_COUNT}). "
+            f"Mais recente: `{os.path.basename(latest)}` ({_format_size(os.path.getsize(latest))}).",
+            ephemeral=True)
+
+    @backup_group.command(name="now", help="Cria agora uma cópia de segurança comprimida e verificada da base de dados.")
+    @commands.has_permissions(administrator=True) # Apenas administradores podem usar
+    async def backup_now(self, ctx: commands.Context):
+        await ctx.defer(ephemeral=True) # Defer para que o bot "pense"
+        if self._backup_lock.locked():
+            await ctx.send("Já há uma cópia em curso; esta começa assim que terminar.", ephemeral=True)
+        try:
+            result = await self._run_backup()
+        except BackupError as e:
+            await ctx.send(f"❌ A cópia de segurança falhou: {e}", ephemeral=True)
+            return
+        except Exception as e:
+            logger.exception("Erro na cópia de segurança pedida por %s.", ctx.author)
+            await ctx.send(f"❌ A cópia de segurança falhou: {e}", ephemeral=True)
+            return
+
+        message = (f"✅ Cópia `{os.path.basename(result['path'])}` criada em `{result['duration_seconds']:.2f}s`: "
+                   f"{_format_size(result['size_bytes'])} comprimida ({_format_size(result['database_bytes'])} na base de dados, "
+                   f"{result['pages']} páginas), integridade verificada.")
+        if result['removed']:
+            message += f"\n🧹 {len(result['removed'])} cópia(s) antiga(s) apagada(s) (retenção: {BACKUP_RETENTION_COUNT})."
+        await ctx.send(message, ephemeral=True)
+        logger.info("Cópia de segurança manual pedida por %s.", ctx.author)
+
+async def setup(bot):
+    """
+    Função necessária para que o Discord.py possa carregar este cog.
+    """
+    await bot.add_cog(BackupCog(bot))
@@ -0,0 +1,83 @@
+import discord
+from discord.ext import commands
+from datetime import datetime
+import asyncio
+import io
+import logging
+
+# Ferramentas de diagnóstico do loop de eventos
+from diagnostics import LoopLagMonitor, configure_slow_callbacks, profile_event_loop
+# Importa configurações do nosso módulo config
+from config import PROFILE_MAX_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Intents de que este cog precisa (ver gateway.declared_intents): comandos com prefixo
+REQUIRED_INTENTS = discord.Intents(guilds=True, guild_messages=True, message_content=True)
+
+# Modos aceites por !profile
+PROFILE_MODES = ("sampling", "cprofile")
+
+class DiagnosticsCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.lag_monitor = LoopLagMonitor()
+        self._loop = None
+        self._previous_loop_debug = None
+        self._profile_lock = asyncio.Lock() # Um profiling de cada vez
+
+    async def cog_load(self):
+        """Liga a deteção de callbacks lentos (se configurada) e o monitor de atraso do loop."""
+        self._loop = asyncio.get_running_loop()
+        self._previous_loop_debug = configure_slow_callbacks(self._loop)
+        self.lag_monitor.start()
+        logger.info("DiagnosticsCog está pronto. Monitor de atraso do loop iniciado.")
+
+    def cog_unload(self):
+        """Para o monitor e repõe o modo de depuração do loop como estava."""
+        self.lag_monitor.stop()
+        if self._loop is not None:
+            self._loop.set_debug(self._previous_loop_debug)
+
+    # --- Reload a quente (ver hot_reload) ---
+    def export_state(self) -> dict:
+        """Estado entregue à nova versão do cog num !reload (histórico de atrasos e modo de depuração original)."""
+        return {'lag_samples': self.lag_monitor.samples, 'previous_loop_debug': self._previous_loop_debug,
+                'profile_lock': self._profile_lock}
+
+    def import_state(self, state: dict):
+        self.lag_monitor.samples = state['lag_samples']
+        self._previous_loop_debug = state['previous_loop_debug']
+        self._profile_lock = state['profile_lock']
+
+    @commands.command(name="profile", help="Faz o profiling do bot durante N segundos e envia os caminhos mais quentes. Uso: !profile <segundos> [sampling|cprofile]")
+    @commands.has_permissions(administrator=True) # Apenas administradores podem usar
+    async def profile(self, ctx: commands.Context, seconds: float, mode: str = "sampling"):
+        mode = mode.lower()
+        if mode not in PROFILE_MODES:
+            await ctx.send(f"Modo inválido. Use um de: {', '.join(PROFILE_MODES)}.", ephemeral=True)
+            return
+        if not 0 < seconds <= PROFILE_MAX_SECONDS:
+            await ctx.send(f"A duração tem de estar entre 0 e {PROFILE_MAX_SECONDS} segundos.", ephemeral=True)
+            return
+        if self._profile_lock.locked():
+            await ctx.send("Já há um profiling em curso. Tente novamente quando terminar.", ephemeral=True)
+            return
+
+        async with self._profile_lock:
+            await ctx.send(f"🔬 A medir o bot durante {seconds:g}s ({mode})...", ephemeral=True)
+            logger.info("Profiling de %ss (%s) pedido por %s.", seconds, mode, ctx.author)
+            report = await profile_event_loop(seconds, mode, self.lag_monitor)
+
+        filename = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+        lag = self.lag_monitor.stats()
+        await ctx.send(
+            f"📄 Profiling concluído. Atraso do loop (última hora): p99 `{lag['p99'] * 1000:.1f} ms`, máx `{lag['max'] * 1000:.1f} ms`.",
+            file=discord.File(io.BytesIO(report.encode('utf-8')), filename=filename),
+            ephemeral=True)
+
+async def setup(bot):
+    """
+    Função necessária para que o Discord.py possa carregar este cog.
+    """
+    await bot.add_cog(DiagnosticsCog(bot))
@@ -2,12 +2,25 @@ import discord
 from discord.ext import commands, tasks # Importa tasks para loops assíncronos
 from datetime import datetime, timedelta
 import asyncio
+import logging
 import os
 
 # Importa funções do nosso módulo database
-from database import record_punch_in, record_punch_out, get_open_punches_for_auto_close, auto_record_punch_out
+# Camada de armazenamento (backend escolhido no config.py)
+from storage import store
+# Cache write-behind dos nomes de exibição (tabela 'members')
+from member_cache import member_names
+# Membros obtidos a pedido (sem a cache completa de membros no modo lean)
+from gateway import get_or_fetch_member
 # Importa configurações do nosso módulo config
-from config import PUNCH_CHANNEL_ID, PUNCH_MESSAGE_FILE, PUNCH_LOGS_CHANNEL_ID, ROLE_ID # ROLE_ID ainda pode ser usado se houver outras permissões
+from config import PUNCH_CHANNEL_ID, PUNCH_MESSAGE_FILE, PUNCH_LOGS_CHANNEL_ID, ROLE_ID, MEMBER_NAME_FLUSH_SECONDS, MYHOURS_CACHE_TTL_SECONDS # ROLE_ID ainda pode ser usado se houver outras permissões
+
+logger = logging.getLogger(__name__)
+
+# Intents de que este cog precisa (ver gateway.declared_intents): comandos com prefixo e canais.
+# on_member_update só é recebido no modo completo (intent 'members'); no modo lean os nomes
+# são atualizados a cada clique e, no fecho automático, obtidos a pedido.
+REQUIRED_INTENTS = discord.Intents(guilds=True, guild_messages=True, message_content=True)
 
 # Tempo limite para fechamento automático de ponto (em horas)
 AUTO_CLOSE_PUNCH_THRESHOLD_HOURS = 3
@@ -28,17 +41,20 @@ class PunchCardView(discord.ui.View):
         member = interaction.user
         current_time_str = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
 
-        success = record_punch_in(member.id, member.display_name)
+        member_names.note(member.id, member.display_name)
+        success = store.record_punch_in(member.id)
+        self.cog.invalidate_hours_cache(member.id)
         if success:
             await interaction.response.send_message(f"Você entrou em serviço em: {current_time_str}", ephemeral=True)
-            print(f'{member.display_name} ({member.id}) entrou em serviço.')
+            if logger.isEnabledFor(logging.DEBUG): # Caminho quente: não monta o 'extra' com o DEBUG desligado
+                logger.debug('%s (%s) entrou em serviço.', member.display_name, member.id, extra={'user_id': member.id})
 
             logs_channel = self.cog.bot.get_channel(PUNCH_LOGS_CHANNEL_ID)
             if logs_channel:
                 log_message = f"🟢 **{member.display_name}** (`{member.id}`) entrou em serviço em: `{current_time_str}`."
                 await logs_channel.send(log_message)
             else:
-                print(f"Erro: Canal de logs com ID {PUNCH_LOGS_CHANNEL_ID} não encontrado.")
+                logger.error("Canal de logs com ID %s não encontrado.", PUNCH_LOGS_CHANNEL_ID)
         else:
             await interaction.response.send_message("Você já está em serviço! Utilize o botão de 'Sair' para registrar sua saída.", ephemeral=True)
 
@@ -50,7 +66,9 @@ class PunchCardView(discord.ui.View):
         member = interaction.user
         current_time_str = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
 
-        success, time_diff = record_punch_out(member.id)
+        member_names.note(member.id, member.display_name)
+        success, time_diff = store.record_punch_out(member.id)
+        self.cog.invalidate_hours_cache(member.id)
         if success:
             total_seconds = int(time_diff.total_seconds())
             hours, remainder = divmod(total_seconds, 3600)
@@ -58,14 +76,15 @@ class PunchCardView(discord.ui.View):
             formatted_time_diff = f"{hours}h {minutes}m {seconds}s"
             
             await interaction.response.send_message(f"Você saiu de serviço em: {current_time_str}. Tempo em serviço: {formatted_time_diff}", ephemeral=True)
-            print(f'{member.display_name} ({member.id}) saiu de serviço. Tempo: {time_diff}')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('%s (%s) saiu de serviço. Tempo: %s', member.display_name, member.id, time_diff, extra={'user_id': member.id, 'duration_seconds': time_diff.total_seconds()})
 
             logs_channel = self.cog.bot.get_channel(PUNCH_LOGS_CHANNEL_ID)
             if logs_channel:
                 log_message = f"🔴 **{member.display_name}** (`{member.id}`) saiu de serviço em: `{current_time_str}`. Tempo total: `{formatted_time_diff}`."
                 await logs_channel.send(log_message)
             else:
-                print(f"Erro: Canal de logs com ID {PUNCH_LOGS_CHANNEL_ID} não encontrado.")
+                logger.error("Canal de logs com ID %s não encontrado.", PUNCH_LOGS_CHANNEL_ID)
         else:
             await interaction.response.send_message("Você não está em serviço! Utilize o botão de 'Entrar' para registrar sua entrada.", ephemeral=True)
 
@@ -74,7 +93,31 @@ class PunchCardCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self._punch_message_id = None
-        # A tarefa será iniciada no on_ready
+        # Cache do !myhours: user_id -> {(início, fim): (expira em, segundos fechados, entrada do ponto aberto)}
+        self._hours_cache = {}
+        self._hours_cache_next_sweep = datetime.now() # Próxima limpeza das entradas expiradas de todos os utilizadores
+        # As tarefas esperam pelo bot pronto (before_loop); iniciá-las aqui, e não no on_ready,
+        # evita arrancá-las duas vezes após uma reconexão e garante que arrancam após um !reload.
+        self.flush_member_names_task.start()
+        self.auto_close_punches.start()
+
+    def cog_unload(self):
+        """Para as tarefas em loop e grava os nomes que ainda estiverem pendentes."""
+        self.auto_close_punches.cancel()
+        self.flush_member_names_task.cancel()
+        member_names.flush()
+
+    # --- Reload a quente (ver hot_reload) ---
+    def export_state(self) -> dict:
+        """Estado entregue à nova versão do cog num !reload."""
+        return {'punch_message_id': self._punch_message_id, 'hours_cache': self._hours_cache}
+
+    def import_state(self, state: dict):
+        """Recebe o estado da versão anterior e volta a associar os botões persistentes a esta instância."""
+        self._punch_message_id = state['punch_message_id']
+        self._hours_cache = state['hours_cache']
+        if self._punch_message_id:
+            self.bot.add_view(PunchCardView(self)) # Substitui a View antiga (mesmos custom_id)
 
     async def _load_punch_message_id(self):
         """Carrega o ID da mensagem de picagem de ponto de um arquivo."""
@@ -83,21 +126,21 @@ class PunchCardCog(commands.Cog):
                 self._punch_message_id = int(f.read().strip())
         except (FileNotFoundError, ValueError):
             self._punch_message_id = None
-        print(f"ID da mensagem de ponto carregado: {self._punch_message_id}")
+        logger.info("ID da mensagem de ponto carregado: %s", self._punch_message_id)
 
     async def _save_punch_message_id(self, message_id: int):
         """Salva o ID da mensagem de picagem de ponto em um arquivo."""
         self._punch_message_id = message_id
         with open(PUNCH_MESSAGE_FILE, 'w') as f:
             f.write(str(message_id))
-        print(f"ID da mensagem de ponto salvo: {self._punch_message_id}")
+        logger.info("ID da mensagem de ponto salvo: %s", self._punch_message_id)
 
     @commands.Cog.listener()
     async def on_ready(self):
         """
-        Quando o bot reconecta, adicionamos a View persistente e iniciamos a tarefa de fechamento automático.
+        Quando o bot reconecta, adicionamos a View persistente.
         """
-        print("PunchCardCog está pronto.")
+        logger.info("PunchCardCog está pronto.")
         await self._load_punch_message_id() # Carrega o ID da mensagem de ponto
 
         if self._punch_message_id:
@@ -107,20 +150,67 @@ class PunchCardCog(commands.Cog):
                 if channel:
                     await channel.fetch_message(self._punch_message_id) # Tenta buscar a mensagem no Discord
                     self.bot.add_view(PunchCardView(self)) # Adiciona a View para reativar os botões
-                    print(f"View de picagem de ponto persistente adicionada para a mensagem ID: {self._punch_message_id}")
+                    logger.info("View de picagem de ponto persistente adicionada para a mensagem ID: %s", self._punch_message_id)
                 else:
-                    print(f"Aviso: Canal de picagem de ponto (ID: {PUNCH_CHANNEL_ID}) não encontrado para re-associar a View.")
+                    logger.warning("Canal de picagem de ponto (ID: %s) não encontrado para re-associar a View.", PUNCH_CHANNEL_ID)
                     self._punch_message_id = None # Reseta para que o !setuppunch possa enviar uma nova mensagem
             except discord.NotFound:
-                print(f"Aviso: Mensagem de picagem de ponto (ID: {self._punch_message_id}) não encontrada, será recriada no próximo setup com !setuppunch.")
+                logger.warning("Mensagem de picagem de ponto (ID: %s) não encontrada, será recriada no próximo setup com !setuppunch.", self._punch_message_id)
                 self._punch_message_id = None # Reseta para enviar nova mensagem
-            except Exception as e:
-                print(f"Erro ao re-associar a View de picagem de ponto: {e}")
+            except Exception:
+                logger.exception("Erro ao re-associar a View de picagem de ponto.")
                 self._punch_message_id = None # Reseta em caso de outros erros
 
-        # Inicia a tarefa de fechamento automático de ponto
-        self.auto_close_punches.start()
-        print("Tarefa de fechamento automático de ponto iniciada.")
+    def invalidate_hours_cache(self, user_id: int):
+        """Descarta os resultados de !myhours em cache de um utilizador (após entrar/sair de serviço)."""
+        self._hours_cache.pop(user_id, None)
+
+    def _get_hours(self, user_id: int, start_day, end_day) -> tuple[float, datetime | None]:
+        """
+        Retorna (segundos de pontos fechados no período, entrada do ponto aberto ou None),
+        com cache por utilizador durante MYHOURS_CACHE_TTL_SECONDS.
+        As entradas expiradas são descartadas na consulta; uma vez por TTL, as de todos os utilizadores.
+        """
+        key = (start_day, end_day)
+        now = datetime.now()
+        user_cache = self._hours_cache.get(user_id)
+        if user_cache:
+            cached = user_cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1], cached[2]
+            user_cache.pop(key, None)
+
+        closed_seconds = store.get_duty_seconds(user_id, start_day, end_day)
+        open_since = store.get_active_punch_start(user_id)
+        if now >= self._hours_cache_next_sweep:
+            self._sweep_hours_cache(now)
+        self._hours_cache.setdefault(user_id, {})[key] = (now + timedelta(seconds=MYHOURS_CACHE_TTL_SECONDS), closed_seconds, open_since)
+        return closed_seconds, open_since
+
+    def _sweep_hours_cache(self, now: datetime):
+        """Remove da cache do !myhours todas as entradas expiradas (e os utilizadores que ficarem sem entradas)."""
+        for user_id in list(self._hours_cache):
+            user_cache = self._hours_cache[user_id]
+            for key in [key for key, entry in user_cache.items() if entry[0] <= now]:
+                del user_cache[key]
+            if not user_cache:
+                del self._hours_cache[user_id]
+        self._hours_cache_next_sweep = now + timedelta(seconds=MYHOURS_CACHE_TTL_SECONDS)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        """Regista mudanças de nome de exibição na cache (gravadas em lote mais tarde)."""
+        if before.display_name != after.display_name:
+            member_names.note(after.id, after.display_name)
+
+    # --- Tarefa de Gravação dos Nomes de Membros ---
+    @tasks.loop(seconds=MEMBER_NAME_FLUSH_SECONDS)
+    async def flush_member_names_task(self):
+        """Grava em lote, na tabela 'members', os nomes de exibição alterados desde a última gravação."""
+        try:
+            member_names.flush()
+        except Exception:
+            logger.exception("Erro ao gravar nomes de membros.")
 
     # --- Tarefa de Fechamento Automático de Ponto ---
     @tasks.loop(minutes=AUTO_CLOSE_CHECK_INTERVAL_MINUTES)
@@ -129,8 +219,14 @@ class PunchCardCog(commands.Cog):
         Verifica periodicamente por pontos abertos que excederam o limite de tempo
         e os fecha automaticamente.
         """
-        # print(f"Verificando pontos abertos para fechamento automático... ({datetime.now().strftime('%H:%M:%S')})") # Descomente para debug no console
-        open_punches = get_open_punches_for_auto_close()
+        # Protegido do cancelamento (unload/!reload): uma verificação em curso termina sempre
+        await asyncio.shield(self._close_expired_punches())
+
+    async def _close_expired_punches(self):
+        """Fecha os pontos abertos há mais de AUTO_CLOSE_PUNCH_THRESHOLD_HOURS horas."""
+        logger.debug("Verificando pontos abertos para fechamento automático...")
+        member_names.flush() # Garante que os logs usam os nomes atuais
+        open_punches = store.get_open_punches_for_auto_close()
         current_time = datetime.now()
         
         for punch in open_punches:
@@ -147,7 +243,8 @@ class PunchCardCog(commands.Cog):
 
             if time_elapsed >= threshold:
                 auto_punch_out_time = current_time
-                auto_record_punch_out(punch_id, auto_punch_out_time)
+                store.auto_record_punch_out(punch_id, auto_punch_out_time)
+                self.invalidate_hours_cache(user_id)
 
                 total_seconds = int(time_elapsed.total_seconds())
                 hours, remainder = divmod(total_seconds, 3600)
@@ -156,15 +253,20 @@ class PunchCardCog(commands.Cog):
                 
                 logs_channel = self.bot.get_channel(PUNCH_LOGS_CHANNEL_ID)
                 if logs_channel:
+                    # Obtém o membro a pedido para registar o nome atual (on_member_update não chega no modo lean)
+                    member = await get_or_fetch_member(logs_channel.guild, user_id)
+                    if member is not None:
+                        username = member.display_name
+                        member_names.note(user_id, username)
                     log_message = (
                         f"🟡 **{username}** (`{user_id}`) teve o ponto fechado automaticamente "
                         f"por estar aberto por mais de {AUTO_CLOSE_PUNCH_THRESHOLD_HOURS} horas.\n"
                         f"Entrada: `{punch_in_time.strftime('%d/%m/%Y %H:%M:%S')}` | Saída Automática: `{auto_punch_out_time.strftime('%d/%m/%Y %H:%M:%S')}` | Duração: `{formatted_time_elapsed}`."
                     )
                     await logs_channel.send(log_message)
-                    print(f"Ponto de {username} (ID: {user_id}) fechado automaticamente.")
+                    logger.info("Ponto de %s (ID: %s) fechado automaticamente.", username, user_id)
                 else:
-                    print(f"Erro: Canal de logs com ID {PUNCH_LOGS_CHANNEL_ID} não encontrado para registrar fechamento automático.")
+                    logger.error("Canal de logs com ID %s não encontrado para registrar fechamento automático.", PUNCH_LOGS_CHANNEL_ID)
             
     @auto_close_punches.before_loop
     async def before_auto_close_punches(self):
@@ -207,13 +309,45 @@ class PunchCardCog(commands.Cog):
                 await self._save_punch_message_id(message.id) # Salva o ID da nova mensagem
                 await ctx.send("Mensagem de picagem de ponto enviada com sucesso!", ephemeral=True)
         except discord.NotFound: # Se o ID estava salvo mas a mensagem foi deletada
-            print("Mensagem de picagem de ponto não encontrada, recriando...")
+            logger.info("Mensagem de picagem de ponto não encontrada, recriando...")
             message = await channel.send(embed=embed, view=view)
             await self._save_punch_message_id(message.id)
             await ctx.send("Mensagem de picagem de ponto recriada com sucesso!", ephemeral=True)
         except Exception as e: # Qualquer outro erro durante o envio/atualização
             await ctx.send(f"Erro ao enviar/atualizar mensagem de picagem de ponto: {e}", ephemeral=True)
-            print(f"Erro ao enviar/atualizar mensagem de picagem de ponto: {e}")
+            logger.exception("Erro ao enviar/atualizar mensagem de picagem de ponto.")
+
+    @commands.command(name="myhours", help="Mostra as tuas horas de serviço. Uso: !myhours [DD/MM/YYYY] [DD/MM/YYYY] (por defeito, a semana atual).")
+    async def my_hours(self, ctx: commands.Context, start_date_str: str = None, end_date_str: str = None):
+        """
+        Comando para os agentes consultarem as próprias horas num período.
+        Sem datas usa a semana atual; com uma data, vai dessa data até hoje.
+        O ponto aberto (se houver) é incluído até ao momento atual.
+        """
+        today = datetime.now().date()
+        try:
+            start_day = datetime.strptime(start_date_str, '%d/%m/%Y').date() if start_date_str else today - timedelta(days=today.weekday())
+            end_day = datetime.strptime(end_date_str, '%d/%m/%Y').date() if end_date_str else today
+        except ValueError:
+            await ctx.send("Formato de data inválido. Use DD/MM/YYYY. Ex: `!myhours 01/01/2025 31/01/2025`", ephemeral=True)
+            return
+
+        if start_day > end_day:
+            await ctx.send("Erro: A data de início não pode ser posterior à data de fim.", ephemeral=True)
+            return
+
+        closed_seconds, open_since = self._get_hours(ctx.author.id, start_day, end_day)
+        total_seconds = closed_seconds
+        open_shift_counted = bool(open_since and start_day <= open_since.date() <= end_day)
+        if open_shift_counted:
+            total_seconds += (datetime.now() - open_since).total_seconds()
+
+        hours, remainder = divmod(int(total_seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        message = f"🕒 Horas de serviço de **{ctx.author.display_name}** entre `{start_day.strftime('%d/%m/%Y')}` e `{end_day.strftime('%d/%m/%Y')}`: `{hours}h {minutes}m {seconds}s`"
+        if open_shift_counted:
+            message += f"\n🟢 Em serviço desde `{open_since.strftime('%d/%m/%Y %H:%M:%S')}` (incluído no total)."
+        await ctx.send(message, ephemeral=True)
 
 # O comando 'relatorio' foi movido para ReportsCog, não está mais aqui.
 
@@ -1,55 +1,215 @@
 import discord
 from discord.ext import commands, tasks
 from datetime import datetime, timedelta
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-# Importa funções do nosso módulo database
-from database import get_punches_for_period
+# Funções de relatório executadas fora do processo do bot
+from report_worker import compute_report, init_report_worker, summarize_records, render_weekly_chart
+# Cache write-behind dos nomes de exibição (tabela 'members')
+from member_cache import member_names
+# Importa o agendador persistente de tarefas
+from scheduler import JobScheduler, ScheduledJob, WeeklyRule
 # Importa configurações do nosso módulo config
-from config import WEEKLY_REPORT_CHANNEL_ID, ROLE_ID # Garante ROLE_ID para permissões de relatório
+from config import (WEEKLY_REPORT_CHANNEL_ID, ROLE_ID, # Garante ROLE_ID para permissões de relatório
+                    WEEKLY_REPORT_WEEKDAY, WEEKLY_REPORT_HOUR, WEEKLY_REPORT_MINUTE, WEEKLY_REPORT_PREPARE_LEAD_MINUTES,
+                    REPORT_WORKER_PROCESSES, REPORT_CHARTS_ENABLED, REPORT_CHART_CPU_BUDGET_SECONDS)
+# Camada de armazenamento (backend escolhido no config.py)
+from storage import store
+
+logger = logging.getLogger(__name__)
+
+# Intents de que este cog precisa (ver gateway.declared_intents): comandos com prefixo e canais
+REQUIRED_INTENTS = discord.Intents(guilds=True, guild_messages=True, message_content=True)
+
+# Nome da tarefa do relatório semanal na tabela 'scheduled_jobs'
+WEEKLY_REPORT_JOB_NAME = "weekly_report"
+# Intervalo com que o agendador verifica se há tarefas vencidas (em segundos)
+SCHEDULER_TICK_SECONDS = 30
+# Nome do anexo do gráfico do relatório semanal e número de gráficos guardados em cache
+REPORT_CHART_FILENAME = "relatorio_semanal.png"
+REPORT_CHART_CACHE_SIZE = 8
 
 class ReportsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        # Inicia a tarefa em loop para enviar relatórios semanais quando o cog é carregado.
-        self.weekly_report_task.start()
-        print("ReportsCog está pronto. Tarefa de relatório semanal iniciada.")
+        # Relatórios pré-calculados em segundo plano, indexados pelo período (início, fim)
+        self._prepared_reports = {}
+        # Relatórios em curso por período: pedidos iguais aguardam o mesmo resultado
+        self._reports_in_flight = {}
+        # Pool limitado de processos para consultas e agregações pesadas (criado no primeiro uso).
+        # 'spawn' evita herdar por fork o estado do loop de eventos e das threads do bot.
+        # Fica num dicionário partilhado com as versões seguintes do cog (!reload): há sempre um único pool.
+        self._report_pool_slot = {'pool': None}
+        self._state_exported = False # Após um !reload, o pool pertence à nova versão
+        # Gráficos já desenhados (bytes PNG), indexados pelo período (início, fim)
+        self._chart_cache = {}
+
+        # O relatório semanal é entregue por um agendador persistente ("segunda 00:05" em hora local),
+        # e não por um loop de 7 dias que deriva e volta a publicar a cada reinício.
+        self.weekly_rule = WeeklyRule(WEEKLY_REPORT_WEEKDAY, WEEKLY_REPORT_HOUR, WEEKLY_REPORT_MINUTE)
+        self.scheduler = JobScheduler()
+        self.scheduler.add_job(ScheduledJob(
+            WEEKLY_REPORT_JOB_NAME,
+            self.weekly_rule,
+            callback=self._deliver_weekly_report,
+            prepare=self._prepare_weekly_report,
+            prepare_lead=timedelta(minutes=WEEKLY_REPORT_PREPARE_LEAD_MINUTES),
+        ))
+        self.scheduler_task.start()
+        logger.info("ReportsCog está pronto. Agendador de relatórios iniciado.")
 
     def cog_unload(self):
         """Garante que a tarefa em loop seja parada quando o cog é descarregado."""
-        self.weekly_report_task.cancel()
-        print("ReportsCog descarregado. Tarefa de relatório semanal parada.")
+        self.scheduler_task.cancel()
+        # O pool fica no dicionário mesmo encerrado: tarefas ainda em curso falham em vez de criarem outro
+        report_pool = self._report_pool_slot['pool']
+        if report_pool and not self._state_exported:
+            report_pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("ReportsCog descarregado. Agendador de relatórios parado.")
+
+    # --- Reload a quente (ver hot_reload) ---
+    def export_state(self) -> dict:
+        """
+        Estado entregue à nova versão do cog num !reload. Os dicionários são partilhados (não copiados):
+        uma preparação ainda em curso na versão antiga grava o resultado onde a nova o vai procurar,
+        e usa o mesmo pool (que a versão antiga já não encerra).
+        """
+        self._state_exported = True
+        return {
+            'prepared_reports': self._prepared_reports,
+            'reports_in_flight': self._reports_in_flight,
+            'chart_cache': self._chart_cache,
+            'report_pool_slot': self._report_pool_slot,
+            'scheduler': self.scheduler.export_state(),
+        }
+
+    def import_state(self, state: dict):
+        """Recebe o estado da versão anterior (caches, relatórios em curso, pool e marcas do agendador)."""
+        self._prepared_reports = state['prepared_reports']
+        self._reports_in_flight = state['reports_in_flight']
+        self._chart_cache = state['chart_cache']
+        if self._report_pool_slot['pool']:
+            self._report_pool_slot['pool'].shutdown(wait=False)
+        self._report_pool_slot = state['report_pool_slot']
+        self.scheduler.import_state(state['scheduler'])
 
-    @tasks.loop(hours=24 * 7) # Executa a cada 7 dias (uma semana)
-    async def weekly_report_task(self):
+    @tasks.loop(seconds=SCHEDULER_TICK_SECONDS)
+    async def scheduler_task(self):
         """
-        Esta tarefa envia um relatório semanal das horas de serviço.
-        Ela é configurada para rodar a cada 7 dias.
+        Verifica periodicamente se há tarefas agendadas vencidas (ou em atraso) e executa-as.
+        Só acede à base de dados quando uma tarefa está perto de vencer.
         """
+        # Protegido do cancelamento (unload/!reload): uma entrega já reivindicada termina sempre
+        await asyncio.shield(self.scheduler.run_pending())
+
+    @scheduler_task.before_loop
+    async def before_scheduler_task(self):
         await self.bot.wait_until_ready() # Garante que o bot esteja pronto antes de iniciar a tarefa.
-        print(f"Tarefa de relatório semanal executando... ({datetime.now().strftime('%d/%m/%Y %H:%M')})")
-        
-        # Chama a função principal de geração de relatório com o período padrão da semana passada.
-        # Não precisa de ctx aqui, pois é um envio automático para um canal específico.
-        await self._generate_and_send_report()
+
+    def _week_period(self, run_time: datetime) -> tuple[datetime, datetime]:
+        """
+        Retorna (início, fim) do período que fecha com a execução 'run_time' da regra semanal:
+        os dias completos desde o dia da execução anterior até à véspera de 'run_time'
+        (com a regra padrão, segunda 00:05, é a semana de segunda a domingo).
+        """
+        previous_run = self.weekly_rule.previous(run_time - timedelta(microseconds=1))
+        start_of_period = previous_run.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        end_of_period = run_time - timedelta(days=1) # Véspera da execução
+        end_of_period = end_of_period.replace(hour=23, minute=59, second=59, microsecond=999999) # Inclui o dia inteiro
+        return start_of_period, end_of_period
+
+    async def _prepare_weekly_report(self, run_time: datetime):
+        """
+        Pré-calcula, fora do loop de eventos, o relatório do período que fecha antes de 'run_time',
+        para que a publicação seja imediata.
+        """
+        period = self._week_period(run_time)
+        try:
+            self._prepared_reports[period] = report = await self._compute_report(*period)
+            await self._render_chart(period, report[0], report[2]) # Aquece a cache do gráfico
+            logger.info("Relatório de %s - %s pré-calculado.", period[0].strftime('%d/%m/%Y'), period[1].strftime('%d/%m/%Y'))
+        except Exception:
+            logger.exception("Erro ao pré-calcular o relatório semanal.")
+
+    async def _deliver_weekly_report(self, run_time: datetime):
+        """Callback do agendador: publica o relatório da semana que fechou antes de 'run_time'."""
+        start_of_period, end_of_period = self._week_period(run_time)
+        await self._generate_and_send_report(start_date=start_of_period, end_date=end_of_period, with_chart=True)
+
+    def _get_report_pool(self) -> ProcessPoolExecutor:
+        """Cria (no primeiro uso) o pool limitado de processos de relatórios e gráficos, partilhado entre versões do cog."""
+        if self._report_pool_slot['pool'] is None:
+            self._report_pool_slot['pool'] = ProcessPoolExecutor(max_workers=REPORT_WORKER_PROCESSES, mp_context=multiprocessing.get_context("spawn"), initializer=init_report_worker)
+        return self._report_pool_slot['pool']
+
+    async def _compute_report(self, start_of_period: datetime, end_of_period: datetime) -> tuple[list, list, dict]:
+        """
+        Calcula (utilizadores ordenados, campos da embed, totais por dia) para o período no pool de processos,
+        sobre uma conexão apenas de leitura, sem bloquear os registos de ponto.
+        Com um backend sem ficheiro (memória), o cálculo corre numa thread do próprio processo.
+        Só corre um cálculo por período de cada vez; pedidos iguais aguardam o mesmo resultado.
+        """
+        period = (start_of_period, end_of_period)
+        in_flight = self._reports_in_flight.get(period)
+        if in_flight is None:
+            member_names.flush() # Os relatórios mostram os nomes atuais da tabela 'members'
+            loop = asyncio.get_running_loop()
+            if store.db_path:
+                in_flight = loop.run_in_executor(self._get_report_pool(), compute_report, store.db_path, start_of_period, end_of_period)
+            else:
+                in_flight = loop.run_in_executor(None, lambda: summarize_records(store.get_punches_for_period(start_of_period, end_of_period)))
+            self._reports_in_flight[period] = in_flight
+            in_flight.add_done_callback(lambda _: self._reports_in_flight.pop(period, None))
+        else:
+            logger.info("Relatório de %s - %s já em curso, aguardando o resultado.", start_of_period.strftime('%d/%m/%Y'), end_of_period.strftime('%d/%m/%Y'))
+        # shield: cancelar um pedido não cancela o cálculo partilhado com os outros
+        return await asyncio.shield(in_flight)
+
+    async def _render_chart(self, period: tuple[datetime, datetime], sorted_users: list, daily_totals: dict) -> bytes | None:
+        """
+        Retorna o gráfico PNG do período, desenhado no pool de processos (nunca no loop de eventos)
+        com um orçamento de CPU por gráfico. O resultado fica em cache por período.
+        Retorna None se os gráficos estiverem desativados, o matplotlib faltar ou o desenho falhar.
+        """
+        if not REPORT_CHARTS_ENABLED or not sorted_users:
+            return None
+        if period in self._chart_cache:
+            return self._chart_cache[period]
+
+        loop = asyncio.get_running_loop()
+        try:
+            png = await loop.run_in_executor(self._get_report_pool(), render_weekly_chart, sorted_users, daily_totals,
+                                             period[0].date(), period[1].date(), REPORT_CHART_CPU_BUDGET_SECONDS)
+        except Exception:
+            logger.exception("Erro ao desenhar o gráfico do relatório.")
+            return None
+        if png is None:
+            logger.warning("Gráfico do relatório indisponível (matplotlib não instalado ou orçamento de CPU excedido).")
+            return None
+
+        self._chart_cache[period] = png
+        while len(self._chart_cache) > REPORT_CHART_CACHE_SIZE:
+            self._chart_cache.pop(next(iter(self._chart_cache))) # Remove o mais antigo
+        return png
 
     # Função auxiliar para gerar e enviar o relatório, reutilizável por loop e comando
-    async def _generate_and_send_report(self, start_date: datetime = None, end_date: datetime = None, ctx: commands.Context = None):
+    async def _generate_and_send_report(self, start_date: datetime = None, end_date: datetime = None, ctx: commands.Context = None, with_chart: bool = False):
         """
         Gera e envia o relatório de horas de serviço para um período específico.
         Se start_date e end_date não forem fornecidos, usa a semana passada.
         O 'ctx' é opcional e é usado se o relatório for acionado por um comando.
+        Com 'with_chart', anexa o gráfico de horas por agente e a tendência diária.
         """
         now = datetime.now()
 
         if start_date is None or end_date is None:
-            # Lógica para a semana passada (padrão)
-            # Define o início da semana como segunda-feira (weekday() retorna 0 para segunda)
-            # Subtrai 7 dias para ir para a semana passada
-            start_of_period = now - timedelta(days=now.weekday() + 7) 
-            start_of_period = start_of_period.replace(hour=0, minute=0, second=0, microsecond=0)
-
-            end_of_period = start_of_period + timedelta(days=6) # Fim da semana passada (domingo)
-            end_of_period = end_of_period.replace(hour=23, minute=59, second=59, microsecond=999999) # Inclui o dia inteiro
+            # Lógica para a semana passada (padrão): o último período já fechado pela regra semanal
+            start_of_period, end_of_period = self._week_period(self.weekly_rule.previous(now))
         else:
             # Usa as datas fornecidas pelo comando
             start_of_period = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -58,15 +218,16 @@ class ReportsCog(commands.Cog):
             if start_of_period > end_of_period:
                 if ctx: # Se for um comando, responde no contexto do comando
                     await ctx.send("Erro: A data de início não pode ser posterior à data de fim.", ephemeral=True)
-                print(f"Erro na data do relatório: Data de início ({start_of_period}) posterior à data de fim ({end_of_period}).")
+                logger.warning("Erro na data do relatório: Data de início (%s) posterior à data de fim (%s).", start_of_period, end_of_period)
                 return
 
-        print(f"Gerando relatório de {start_of_period.strftime('%d/%m/%Y %H:%M')} a {end_of_period.strftime('%d/%m/%Y %H:%M')}")
+        logger.info("Gerando relatório de %s a %s", start_of_period.strftime('%d/%m/%Y %H:%M'), end_of_period.strftime('%d/%m/%Y %H:%M'))
 
-        records = get_punches_for_period(start_of_period, end_of_period)
-        user_total_times = {}
+        # O relatório automático aproveita o resultado pré-calculado, se existir
+        prepared = None if ctx else self._prepared_reports.pop((start_of_period, end_of_period), None)
+        sorted_users, report_fields, daily_totals = prepared or await self._compute_report(start_of_period, end_of_period)
 
-        if not records:
+        if not sorted_users:
             if ctx:
                 await ctx.send("Nenhum registro de ponto encontrado para o período especificado.", ephemeral=True)
             else: # Para o relatório automático
@@ -75,20 +236,6 @@ class ReportsCog(commands.Cog):
                     await report_channel.send(f"**Relatório Semanal de Serviço ({start_of_period.strftime('%d/%m/%Y')} - {end_of_period.strftime('%d/%m/%Y')})**\n\nNenhum registro de serviço encontrado para o período especificado.")
             return
 
-        for record in records:
-            user_id = record['user_id']
-            username = record['username']
-            punch_in_str = record['punch_in_time']
-            punch_out_str = record['punch_out_time']
-
-            punch_in = datetime.fromisoformat(punch_in_str)
-            punch_out = datetime.fromisoformat(punch_out_str)
-            
-            duration = punch_out - punch_in
-            
-            user_total_times.setdefault(user_id, {'username': username, 'total_duration': timedelta(0)})
-            user_total_times[user_id]['total_duration'] += duration
-
         # --- CONSTRUÇÃO DA EMBED DO RELATÓRIO ---
         embed = discord.Embed(
             title=f"📊 Relatório de Horas de Serviço (LSPD)",
@@ -96,44 +243,10 @@ class ReportsCog(commands.Cog):
             color=discord.Color.from_rgb(50, 205, 50) # Verde vibrante
         )
         embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1260308350776774817/1386713008256061512/Untitled_1024_x_1024_px_4.png") # Logo LSPD
-        
-        # Ordena os utilizadores pelo tempo total em serviço (do maior para o menor)
-        sorted_users = sorted(user_total_times.items(), key=lambda item: item[1]['total_duration'], reverse=True)
 
-        # Adiciona os membros como campos da embed
-        if sorted_users:
-            current_field_value = ""
-            field_count = 0
-            
-            for i, (user_id, data) in enumerate(sorted_users):
-                username = data['username']
-                total_duration = data['total_duration']
-                
-                total_seconds = int(total_duration.total_seconds())
-                hours, remainder = divmod(total_seconds, 3600)
-                minutes, seconds = divmod(remainder, 60)
-                formatted_total_time = f"{hours}h {minutes}m {seconds}s"
-                
-                # Linha para o relatório
-                line = f"**{i+1}. {username}** (`{user_id}`)\nTempo Total: `{formatted_total_time}`"
-                
-                # Verifica se a linha atual e o separador excederão o limite do campo (1024 chars)
-                if len(current_field_value) + len(line) + 1 > 1024 and current_field_value: 
-                    embed.add_field(name=f"Membros em Serviço (parte {field_count + 1})", value=current_field_value, inline=False)
-                    current_field_value = line
-                    field_count += 1
-                else:
-                    if current_field_value:
-                        current_field_value += "\n" + line
-                    else:
-                        current_field_value = line
-            
-            # Adiciona o último campo (se não estiver vazio)
-            if current_field_value:
-                if field_count == 0: # Se tudo coube em um único campo
-                    embed.add_field(name="Membros em Serviço", value=current_field_value, inline=False)
-                else: # Se foram criados múltiplos campos
-                    embed.add_field(name=f"Membros em Serviço (parte {field_count + 1})", value=current_field_value, inline=False)
+        # Adiciona os membros como campos da embed (texto já preparado no processo de relatórios)
+        for field_name, field_value in report_fields:
+            embed.add_field(name=field_name, value=field_value, inline=False)
 
         embed.set_footer(
             text="Relatório gerado automaticamente pelo Sistema de Ponto LSPD.",
@@ -141,17 +254,25 @@ class ReportsCog(commands.Cog):
         )
         # --- FIM DA CONSTRUÇÃO DA EMBED ---
 
+        send_kwargs = {'embed': embed}
+        if with_chart:
+            png = await self._render_chart((start_of_period, end_of_period), sorted_users, daily_totals)
+            if png:
+                # O gráfico é enviado a partir de um buffer em memória, sem ficheiros temporários
+                send_kwargs['file'] = discord.File(io.BytesIO(png), filename=REPORT_CHART_FILENAME)
+                embed.set_image(url=f"attachment://{REPORT_CHART_FILENAME}")
+
         # Envia o relatório para o canal de logs ou para o contexto do comando
         if ctx: # Se foi acionado por um comando, responde no canal do comando
-            await ctx.send(embed=embed, ephemeral=True)
-            print("Relatório acionado por comando enviado.")
+            await ctx.send(**send_kwargs, ephemeral=True)
+            logger.info("Relatório acionado por comando enviado.")
         else: # Se foi acionado pela tarefa automática, envia para o canal de relatório semanal
             report_channel = self.bot.get_channel(WEEKLY_REPORT_CHANNEL_ID)
             if report_channel:
-                await report_channel.send(embed=embed)
-                print("Relatório semanal automático enviado com sucesso.")
+                await report_channel.send(**send_kwargs)
+                logger.info("Relatório semanal automático enviado com sucesso.")
             else:
-                print(f"Erro: Canal de relatório semanal com ID {WEEKLY_REPORT_CHANNEL_ID} não encontrado para envio automático.")
+                logger.error("Canal de relatório semanal com ID %s não encontrado para envio automático.", WEEKLY_REPORT_CHANNEL_ID)
         
     # --- COMANDO PARA FORÇAR O RELATÓRIO SEMANAL ---
     @commands.command(name="forcereport", help="Força a geração e o envio do relatório de horas de serviço. Use !forcereport [DD/MM/YYYY] [DD/MM/YYYY] para um período específico.")
@@ -184,8 +305,9 @@ class ReportsCog(commands.Cog):
             await ctx.send("Para um período específico, forneça AMBAS as datas (início e fim).", ephemeral=True)
             return
 
-        # Chama a função auxiliar que agora aceita as datas e o contexto
-        await self._generate_and_send_report(start_date=start_date, end_date=end_date, ctx=ctx)
+        # Chama a função auxiliar que agora aceita as datas e o contexto.
+        # Sem datas é o relatório semanal, que leva o gráfico anexado.
+        await self._generate_and_send_report(start_date=start_date, end_date=end_date, ctx=ctx, with_chart=start_date is None)
 
 async def setup(bot):
     await bot.add_cog(ReportsCog(bot))
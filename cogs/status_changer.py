@@ -2,10 +2,16 @@ import discord
 from discord.ext import commands, tasks
 import random
 import asyncio
+import logging
 
 # Importa as configurações de status do nosso arquivo config.py
 from config import DEFAULT_STATUS_TYPE, BOT_ACTIVITIES, ACTIVITY_CHANGE_INTERVAL_SECONDS
 
+logger = logging.getLogger(__name__)
+
+# Intents de que este cog precisa (ver gateway.declared_intents): mudar a presença do bot não requer 'presences'
+REQUIRED_INTENTS = discord.Intents(guilds=True, guild_messages=True, message_content=True)
+
 class StatusChangerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -16,13 +22,26 @@ class StatusChangerCog(commands.Cog):
         if BOT_ACTIVITIES:
             self.change_activity_task.start()
         else:
-            print("Nenhuma atividade de bot configurada em BOT_ACTIVITIES. A tarefa de mudança de atividade não será iniciada.")
+            logger.warning("Nenhuma atividade de bot configurada em BOT_ACTIVITIES. A tarefa de mudança de atividade não será iniciada.")
 
     def cog_unload(self):
         """Garante que a tarefa em loop seja parada quando o cog é descarregado."""
         if BOT_ACTIVITIES:
             self.change_activity_task.cancel()
 
+    # --- Reload a quente (ver hot_reload) ---
+    def export_state(self) -> dict:
+        """Estado entregue à nova versão do cog num !reload."""
+        return {'activity_index': self._current_activity_index, 'last_set_activity': self._last_set_activity,
+                'rotating': self.change_activity_task.is_running()}
+
+    def import_state(self, state: dict):
+        """Continua a alternância onde ia, ou mantém-na suspensa se havia uma atividade manual."""
+        self._current_activity_index = state['activity_index'] % len(BOT_ACTIVITIES) if BOT_ACTIVITIES else 0
+        self._last_set_activity = state['last_set_activity']
+        if not state['rotating'] and self.change_activity_task.is_running():
+            self.change_activity_task.cancel()
+
     @commands.Cog.listener()
     async def on_ready(self):
         """
@@ -30,7 +49,7 @@ class StatusChangerCog(commands.Cog):
         Se houver atividades configuradas, a primeira será usada.
         Caso contrário, o bot ficará sem atividade definida.
         """
-        print("StatusChangerCog está pronto.")
+        logger.info("StatusChangerCog está pronto.")
         # Se houver atividades, define a primeira como atividade inicial
         if BOT_ACTIVITIES and not self.change_activity_task.running:
             # Se a tarefa não está rodando (e.g., BOT_ACTIVITIES estava vazia e foi preenchida depois)
@@ -39,19 +58,19 @@ class StatusChangerCog(commands.Cog):
             activity = self._create_activity(activity_type, message, url)
             await self.bot.change_presence(activity=activity, status=DEFAULT_STATUS_TYPE)
             self._last_set_activity = activity
-            print(f"Status inicial do bot definido: {activity.name} ({activity_type.name})")
+            logger.info("Status inicial do bot definido: %s (%s)", activity.name, activity_type.name)
         elif not BOT_ACTIVITIES:
             # Se não houver atividades configuradas, apenas define o status padrão.
             await self.bot.change_presence(status=DEFAULT_STATUS_TYPE)
-            print(f"Status inicial do bot definido (sem atividade): {DEFAULT_STATUS_TYPE}")
+            logger.info("Status inicial do bot definido (sem atividade): %s", DEFAULT_STATUS_TYPE)
         elif self.change_activity_task.running and self._last_set_activity:
             # Se a tarefa já está rodando (bot reconectou) e já tinha uma atividade, tenta redefinir a última
             await self.bot.change_presence(activity=self._last_set_activity, status=DEFAULT_STATUS_TYPE)
-            print(f"Bot reconectado, mantendo status: {self._last_set_activity.name}")
+            logger.info("Bot reconectado, mantendo status: %s", self._last_set_activity.name)
         else:
             # fallback genérico se as condições acima não cobrirem (raro)
             await self.bot.change_presence(status=DEFAULT_STATUS_TYPE)
-            print(f"Bot reconectado, status padrão definido.")
+            logger.info("Bot reconectado, status padrão definido.")
 
 
     def _create_activity(self, activity_type: discord.ActivityType, message: str, url: str = None):
@@ -67,11 +86,11 @@ class StatusChangerCog(commands.Cog):
             if url:
                 return discord.Streaming(name=message, url=url)
             else:
-                print(f"Aviso: Tipo de atividade STREAMING selecionado para '{message}', mas nenhuma URL foi fornecida. Usando Playing em vez disso.")
+                logger.warning("Tipo de atividade STREAMING selecionado para '%s', mas nenhuma URL foi fornecida. Usando Playing em vez disso.", message)
                 return discord.Game(name=message)
         else:
             # Default para Game se o tipo não for reconhecido
-            print(f"Aviso: Tipo de atividade '{activity_type}' não reconhecido. Usando Playing para '{message}'.")
+            logger.warning("Tipo de atividade '%s' não reconhecido. Usando Playing para '%s'.", activity_type, message)
             return discord.Game(name=message)
 
 
@@ -81,7 +100,7 @@ class StatusChangerCog(commands.Cog):
         Tarefa em loop para alternar a atividade do bot periodicamente.
         """
         if not BOT_ACTIVITIES:
-            print("Nenhuma atividade configurada para alternar. Parando a tarefa de mudança de atividade.")
+            logger.warning("Nenhuma atividade configurada para alternar. Parando a tarefa de mudança de atividade.")
             self.change_activity_task.cancel()
             return
 
@@ -91,9 +110,9 @@ class StatusChangerCog(commands.Cog):
         try:
             await self.bot.change_presence(activity=activity, status=DEFAULT_STATUS_TYPE)
             self._last_set_activity = activity # Armazena a última atividade definida
-            print(f"Atividade do bot alterada para: {message} ({activity_type.name})")
-        except Exception as e:
-            print(f"Erro ao tentar mudar a atividade do bot: {e}")
+            logger.debug("Atividade do bot alterada para: %s (%s)", message, activity_type.name)
+        except Exception:
+            logger.exception("Erro ao tentar mudar a atividade do bot.")
 
         # Avança para a próxima atividade ou volta para o início
         self._current_activity_index = (self._current_activity_index + 1) % len(BOT_ACTIVITIES)
@@ -103,7 +122,7 @@ class StatusChangerCog(commands.Cog):
     async def before_change_activity_task(self):
         """Espera o bot estar pronto antes de iniciar a tarefa de mudança de atividade."""
         await self.bot.wait_until_ready()
-        print("Tarefa de mudança de atividade aguardando o bot ficar pronto...")
+        logger.debug("Tarefa de mudança de atividade aguardando o bot ficar pronto...")
 
 
     # --- Comandos Manuais de Status (apenas para administradores) ---
@@ -128,7 +147,7 @@ class StatusChangerCog(commands.Cog):
                 current_activity = self._last_set_activity if self._last_set_activity else None
                 await self.bot.change_presence(activity=current_activity, status=chosen_status)
                 await ctx.send(f"Status do bot alterado para: **{status.upper()}**.")
-                print(f"Admin {ctx.author} alterou o status do bot para {status.upper()}")
+                logger.info("Admin %s alterou o status do bot para %s", ctx.author, status.upper())
             except Exception as e:
                 await ctx.send(f"Erro ao alterar o status: {e}")
         else:
@@ -181,12 +200,12 @@ class StatusChangerCog(commands.Cog):
             # Para definir uma atividade manual, paramos a tarefa de alternância
             if self.change_activity_task.is_running():
                 self.change_activity_task.cancel()
-                print("Tarefa de mudança de atividade suspensa para atividade manual.")
+                logger.info("Tarefa de mudança de atividade suspensa para atividade manual.")
 
             await self.bot.change_presence(activity=activity, status=DEFAULT_STATUS_TYPE)
             self._last_set_activity = activity # Armazena a atividade manual
             await ctx.send(f"Atividade do bot alterada para **{chosen_activity_type.name.upper()}**: `{message}`.")
-            print(f"Admin {ctx.author} alterou a atividade do bot para {chosen_activity_type.name.upper()}: '{message}'")
+            logger.info("Admin %s alterou a atividade do bot para %s: '%s'", ctx.author, chosen_activity_type.name.upper(), message)
         except Exception as e:
             await ctx.send(f"Erro ao alterar a atividade: {e}")
 
@@ -201,7 +220,7 @@ class StatusChangerCog(commands.Cog):
                 self._current_activity_index = 0 # Reinicia o contador para começar da primeira atividade
                 self.change_activity_task.start()
                 await ctx.send("Alternância automática de atividades reiniciada.")
-                print("Alternância automática de atividades reiniciada por admin.")
+                logger.info("Alternância automática de atividades reiniciada por admin.")
             else:
                 await ctx.send("A alternância automática de atividades já está ativa.")
         else:
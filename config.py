@@ -62,3 +62,80 @@ BOT_ACTIVITIES = [
 
 # Intervalo em segundos para alternar entre as atividades (se BOT_ACTIVITIES não estiver vazio)
 ACTIVITY_CHANGE_INTERVAL_SECONDS = 30 # 30 segundos
+
+
+# --- Configurações do Relatório Semanal Agendado ---
+# Dia/hora (hora local) em que o relatório da semana anterior é publicado. 0 = segunda-feira ... 6 = domingo.
+WEEKLY_REPORT_WEEKDAY = int(os.getenv('WEEKLY_REPORT_WEEKDAY', 0))
+WEEKLY_REPORT_HOUR = int(os.getenv('WEEKLY_REPORT_HOUR', 0))
+WEEKLY_REPORT_MINUTE = int(os.getenv('WEEKLY_REPORT_MINUTE', 5))
+# Quantos minutos antes da publicação o relatório é pré-calculado em segundo plano
+WEEKLY_REPORT_PREPARE_LEAD_MINUTES = int(os.getenv('WEEKLY_REPORT_PREPARE_LEAD_MINUTES', 4))
+# Número máximo de execuções em atraso recuperadas após o bot ter estado desligado
+SCHEDULER_MAX_CATCHUP_RUNS = int(os.getenv('SCHEDULER_MAX_CATCHUP_RUNS', 4))
+
+# --- Configurações da Cache de Nomes de Membros ---
+# Intervalo (em segundos) com que os nomes de exibição alterados são gravados em lote na tabela 'members'
+MEMBER_NAME_FLUSH_SECONDS = int(os.getenv('MEMBER_NAME_FLUSH_SECONDS', 60))
+
+# --- Configurações de Execução dos Relatórios ---
+# Número máximo de processos dedicados a relatórios pesados (consultas longas e agregação)
+REPORT_WORKER_PROCESSES = int(os.getenv('REPORT_WORKER_PROCESSES', 1))
+
+# --- Configurações do Comando !myhours ---
+# Tempo (em segundos) durante o qual o resultado de !myhours fica em cache por utilizador
+MYHOURS_CACHE_TTL_SECONDS = int(os.getenv('MYHOURS_CACHE_TTL_SECONDS', 60))
+
+# --- Configurações do Armazenamento ---
+# Backend de armazenamento: 'sqlite' (ficheiro DATABASE_NAME) ou 'memory' (apenas em memória, para testes/benchmarks)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+# Gráficos (PNG) anexados ao relatório semanal: requer o pacote opcional 'matplotlib'
+REPORT_CHARTS_ENABLED = os.getenv('REPORT_CHARTS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Tempo máximo de CPU (em segundos) que cada gráfico pode gastar antes de ser descartado
+REPORT_CHART_CPU_BUDGET_SECONDS = int(os.getenv('REPORT_CHART_CPU_BUDGET_SECONDS', 5))
+
+# --- Configurações de Logging ---
+# Nível global dos logs (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Níveis por módulo, ex.: "cogs.punch_card=DEBUG,discord=WARNING"
+LOG_MODULE_LEVELS = os.getenv('LOG_MODULE_LEVELS', 'discord=WARNING')
+# Ficheiro de log rotativo (vazio para desativar) e a sua rotação
+LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
+LOG_FILE_MAX_BYTES = int(os.getenv('LOG_FILE_MAX_BYTES', 5 * 1024 * 1024)) # 5 MB
+LOG_FILE_BACKUP_COUNT = int(os.getenv('LOG_FILE_BACKUP_COUNT', 5))
+
+# --- Configurações da Ligação ao Gateway ---
+# Modo "lean": pede ao Discord apenas os intents declarados pelos cogs (sem presences nem lista completa de membros),
+# não faz chunking dos servidores no arranque e só guarda em cache os membros vistos em interações.
+# Desligado por omissão: sem o intent 'members', on_member_update deixa de chegar e os nomes na tabela
+# 'members' só são atualizados quando o agente clica nos botões (ou no fecho automático do ponto).
+LEAN_GATEWAY_MODE = os.getenv('LEAN_GATEWAY_MODE', 'false').lower() in ('1', 'true', 'yes')
+# Número máximo de membros (vistos em interações ou obtidos a pedido) guardados em cache no modo lean
+LEAN_MEMBER_CACHE_SIZE = int(os.getenv('LEAN_MEMBER_CACHE_SIZE', 1000))
+# Tempo (em segundos) após o arranque em que se medem a memória (RSS) e o CPU do processo
+GATEWAY_STATS_WINDOW_SECONDS = int(os.getenv('GATEWAY_STATS_WINDOW_SECONDS', 300))
+# Ficheiro onde fica a última medição de cada modo (para comparar lean com completo)
+GATEWAY_STATS_FILE = 'gateway_stats.json'
+
+# --- Configurações das Cópias de Segurança ---
+# Pasta onde ficam as cópias comprimidas da base de dados
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+# Hora local da cópia diária automática
+BACKUP_HOUR = int(os.getenv('BACKUP_HOUR', 4))
+BACKUP_MINUTE = int(os.getenv('BACKUP_MINUTE', 30))
+# Número de cópias mantidas (as mais antigas são apagadas)
+BACKUP_RETENTION_COUNT = int(os.getenv('BACKUP_RETENTION_COUNT', 14))
+# Páginas copiadas por passo e pausa entre passos: passos pequenos nunca atrasam as escritas de ponto
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', 128))
+BACKUP_STEP_SLEEP_SECONDS = float(os.getenv('BACKUP_STEP_SLEEP_SECONDS', 0.005))
+
+# --- Configurações de Diagnóstico ---
+# Modo de depuração do asyncio: regista cada callback que ocupe o loop mais do que o limite abaixo
+ASYNCIO_DEBUG = os.getenv('ASYNCIO_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+SLOW_CALLBACK_THRESHOLD_SECONDS = float(os.getenv('SLOW_CALLBACK_THRESHOLD_SECONDS', 0.1))
+# Monitor de atraso do loop: intervalo entre medições e atraso a partir do qual é registado um aviso
+LOOP_LAG_CHECK_INTERVAL_SECONDS = float(os.getenv('LOOP_LAG_CHECK_INTERVAL_SECONDS', 0.5))
+LOOP_LAG_WARN_SECONDS = float(os.getenv('LOOP_LAG_WARN_SECONDS', 0.25))
+# !profile: duração máxima da janela e intervalo entre amostras do profiler
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 120))
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_SECONDS', 0.005))
@@ -1,30 +1,68 @@
+import logging
 import sqlite3
-from datetime import datetime, timedelta
+from contextlib import closing
+from datetime import date, datetime, timedelta
 
 from config import DATABASE_NAME # Importa o nome do banco de dados do config.py
 
+logger = logging.getLogger(__name__)
+
 def get_db_connection():
     """Retorna uma conexão com o banco de dados."""
     conn = sqlite3.connect(DATABASE_NAME)
     conn.row_factory = sqlite3.Row # Permite acessar colunas por nome (como um dicionário)
     return conn
 
+def get_read_connection(db_path: str = None):
+    """
+    Retorna uma conexão apenas de leitura, para relatórios e consultas pesadas.
+    Com o modo WAL, cada leitura vê um snapshot consistente e não bloqueia as escritas de ponto.
+    'db_path' permite abrir a base de dados a partir de outro processo (ex.: pool de relatórios).
+    """
+    conn = sqlite3.connect(f"file:{db_path or DATABASE_NAME}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
 def setup_database():
     """
-    Cria as tabelas 'punches' e 'tickets' se elas não existirem.
+    Cria as tabelas 'punches', 'members', 'duty_daily_totals', 'tickets' e 'scheduled_jobs' se elas não existirem.
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        # WAL permite que os relatórios leiam em paralelo com as escritas de ponto (fica gravado no ficheiro)
+        cursor.execute("PRAGMA journal_mode=WAL")
         # Tabela para registros de picagem de ponto
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS punches (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
-                username TEXT NOT NULL,
                 punch_in_time TEXT,
                 punch_out_time TEXT
             )
         ''')
+        # Tabela de membros: o nome atual de cada utilizador é guardado uma única vez
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS members (
+                user_id INTEGER PRIMARY KEY,
+                display_name TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        _migrate_punch_usernames(cursor)
+        # Índice de horas por utilizador: total do dia e soma acumulada (prefix-sum) até esse dia, inclusive
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS duty_daily_totals (
+                user_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                cumulative_seconds REAL NOT NULL,
+                PRIMARY KEY (user_id, day)
+            )
+        ''')
+        _backfill_duty_daily_totals(cursor)
+        # Índices: o ponto aberto de cada utilizador (caminho dos botões) e o intervalo dos relatórios
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_punches_open_by_user ON punches (user_id) WHERE punch_out_time IS NULL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_punches_punch_in_time ON punches (punch_in_time)")
         # Tabela para registros de tickets
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS tickets (
@@ -36,28 +74,144 @@ def setup_database():
                 created_at TEXT NOT NULL
             )
         ''')
+        # Tabela para tarefas agendadas (relatórios, etc.) e a sua marca da última execução
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                job_name TEXT PRIMARY KEY,
+                last_run_time TEXT,
+                claimed_at TEXT
+            )
+        ''')
         conn.commit() # Salva as mudanças no banco de dados.
-    print("DEBUG: Tabelas de banco de dados 'punches' e 'tickets' verificadas/criadas.")
+    logger.debug("Tabelas de banco de dados 'punches', 'members', 'duty_daily_totals', 'tickets' e 'scheduled_jobs' verificadas/criadas.")
+
+def _migrate_punch_usernames(cursor):
+    """
+    Migra bases de dados antigas em que cada registo de 'punches' repetia o 'username'.
+    Copia o nome mais recente de cada utilizador para 'members' (um por utilizador)
+    e reconstrói 'punches' sem a coluna 'username'.
+    """
+    cursor.execute("PRAGMA table_info(punches)")
+    if 'username' not in [column['name'] for column in cursor.fetchall()]:
+        return
+
+    # O nome do registo mais recente de cada utilizador prevalece
+    cursor.execute("""
+        INSERT OR IGNORE INTO members (user_id, display_name, updated_at)
+        SELECT p.user_id, p.username, COALESCE(p.punch_out_time, p.punch_in_time)
+        FROM punches p
+        WHERE p.id = (SELECT MAX(id) FROM punches WHERE user_id = p.user_id)
+    """)
+    cursor.execute('''
+        CREATE TABLE punches_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            punch_in_time TEXT,
+            punch_out_time TEXT
+        )
+    ''')
+    cursor.execute("INSERT INTO punches_new (id, user_id, punch_in_time, punch_out_time) SELECT id, user_id, punch_in_time, punch_out_time FROM punches")
+    cursor.execute("DROP TABLE punches")
+    cursor.execute("ALTER TABLE punches_new RENAME TO punches")
+    logger.info("Tabela 'punches' migrada: nomes de utilizador movidos para a tabela 'members'.")
+
+def _backfill_duty_daily_totals(cursor):
+    """
+    Preenche 'duty_daily_totals' a partir dos registos fechados já existentes
+    (apenas quando a tabela está vazia, ex.: na primeira execução após a atualização).
+    """
+    cursor.execute("SELECT 1 FROM duty_daily_totals LIMIT 1")
+    if cursor.fetchone():
+        return
+    cursor.execute("SELECT user_id, punch_in_time, punch_out_time FROM punches WHERE punch_out_time IS NOT NULL")
+    daily = {}
+    for row in cursor.fetchall():
+        punch_in = datetime.fromisoformat(row['punch_in_time'])
+        seconds = (datetime.fromisoformat(row['punch_out_time']) - punch_in).total_seconds()
+        key = (row['user_id'], punch_in.date().isoformat())
+        daily[key] = daily.get(key, 0.0) + seconds
+    if not daily:
+        return
+
+    rows = []
+    cumulative = {}
+    for (user_id, day), seconds in sorted(daily.items()):
+        cumulative[user_id] = cumulative.get(user_id, 0.0) + seconds
+        rows.append((user_id, day, seconds, cumulative[user_id]))
+    cursor.executemany("INSERT INTO duty_daily_totals (user_id, day, seconds, cumulative_seconds) VALUES (?, ?, ?, ?)", rows)
+    logger.info("Índice de horas por utilizador preenchido com %d dias.", len(rows))
+
+def _add_duty_seconds(cursor, user_id: int, punch_in_time: datetime, seconds: float):
+    """
+    Soma a duração de um ponto fechado ao dia da entrada (como nos relatórios)
+    e atualiza a soma acumulada desse dia e dos dias seguintes do utilizador.
+    Normalmente o ponto é do dia mais recente, pelo que só uma linha é alterada.
+    """
+    day = punch_in_time.date().isoformat()
+    cursor.execute("""
+        UPDATE duty_daily_totals SET seconds = seconds + ?, cumulative_seconds = cumulative_seconds + ?
+        WHERE user_id = ? AND day = ?
+    """, (seconds, seconds, user_id, day))
+    if cursor.rowcount == 0:
+        cursor.execute("SELECT cumulative_seconds FROM duty_daily_totals WHERE user_id = ? AND day < ? ORDER BY day DESC LIMIT 1",
+                       (user_id, day))
+        previous = cursor.fetchone()
+        cursor.execute("INSERT INTO duty_daily_totals (user_id, day, seconds, cumulative_seconds) VALUES (?, ?, ?, ?)",
+                       (user_id, day, seconds, (previous[0] if previous else 0.0) + seconds))
+    cursor.execute("UPDATE duty_daily_totals SET cumulative_seconds = cumulative_seconds + ? WHERE user_id = ? AND day > ?",
+                   (seconds, user_id, day))
 
 # --- Funções para Picagem de Ponto ---
 
-def record_punch_in(user_id: int, username: str) -> bool:
+def _punch_in(cursor, user_id: int) -> bool:
+    """Regista a entrada usando o cursor dado (sem commit). Retorna False se já estava em serviço."""
+    # Verifica se o usuário já está em serviço (punch_out_time IS NULL)
+    cursor.execute("SELECT id FROM punches WHERE user_id = ? AND punch_out_time IS NULL", (user_id,))
+    if cursor.fetchone():
+        return False # Usuário já está em serviço
+
+    current_time = datetime.now().isoformat() # Armazena em formato ISO 8601 (YYYY-MM-DDTHH:MM:SS.ffffff)
+    cursor.execute("INSERT INTO punches (user_id, punch_in_time) VALUES (?, ?)",
+                   (user_id, current_time))
+    return True
+
+def _punch_out(cursor, user_id: int) -> tuple[bool, timedelta | None]:
+    """Regista a saída usando o cursor dado (sem commit). Retorna (False, None) se não estava em serviço."""
+    # Procura o último registro de entrada sem saída para este usuário.
+    cursor.execute("SELECT id, punch_in_time FROM punches WHERE user_id = ? AND punch_out_time IS NULL ORDER BY id DESC LIMIT 1", (user_id,))
+    active_punch = cursor.fetchone()
+
+    if active_punch:
+        punch_id, punch_in_time_str = active_punch
+        punch_in_time = datetime.fromisoformat(punch_in_time_str) # Converte de volta para datetime
+        current_time = datetime.now().isoformat()
+        time_diff = datetime.now() - punch_in_time
+
+        # Atualiza o registro com o horário de saída.
+        cursor.execute("UPDATE punches SET punch_out_time = ? WHERE id = ?",
+                       (current_time, punch_id))
+        _add_duty_seconds(cursor, user_id, punch_in_time, time_diff.total_seconds())
+        return True, time_diff
+    else:
+        return False, None
+
+def record_punch_in(user_id: int) -> bool:
     """
     Registra a entrada em serviço de um usuário.
     Retorna True se a entrada foi registrada, False se o usuário já estava em serviço.
     """
+    with get_db_connection() as conn:
+        success = _punch_in(conn.cursor(), user_id)
+        conn.commit()
+        return success
+
+def record_punch_ins(user_ids: list[int]) -> dict[int, bool]:
+    """Versão em lote de record_punch_in: uma única transação. Retorna {user_id: registado?}."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        # Verifica se o usuário já está em serviço (punch_out_time IS NULL)
-        cursor.execute("SELECT id FROM punches WHERE user_id = ? AND punch_out_time IS NULL", (user_id,))
-        if cursor.fetchone():
-            return False # Usuário já está em serviço
-
-        current_time = datetime.now().isoformat() # Armazena em formato ISO 8601 (YYYY-MM-DDTHH:MM:SS.ffffff)
-        cursor.execute("INSERT INTO punches (user_id, username, punch_in_time) VALUES (?, ?, ?)",
-                       (user_id, username, current_time))
+        results = {user_id: _punch_in(cursor, user_id) for user_id in user_ids}
         conn.commit()
-        return True
+        return results
 
 def record_punch_out(user_id: int) -> tuple[bool, timedelta | None]:
     """
@@ -65,42 +219,39 @@ def record_punch_out(user_id: int) -> tuple[bool, timedelta | None]:
     Retorna (True, timedelta) se a saída foi registrada com a duração,
     (False, None) se o usuário não estava em serviço.
     """
+    with get_db_connection() as conn:
+        result = _punch_out(conn.cursor(), user_id)
+        conn.commit()
+        return result
+
+def record_punch_outs(user_ids: list[int]) -> dict[int, tuple[bool, timedelta | None]]:
+    """Versão em lote de record_punch_out: uma única transação. Retorna {user_id: (sucesso, duração)}."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        # Procura o último registro de entrada sem saída para este usuário.
-        cursor.execute("SELECT id, punch_in_time FROM punches WHERE user_id = ? AND punch_out_time IS NULL ORDER BY id DESC LIMIT 1", (user_id,))
-        active_punch = cursor.fetchone()
-
-        if active_punch:
-            punch_id, punch_in_time_str = active_punch
-            punch_in_time = datetime.fromisoformat(punch_in_time_str) # Converte de volta para datetime
-            current_time = datetime.now().isoformat()
-            time_diff = datetime.now() - punch_in_time
-            
-            # Atualiza o registro com o horário de saída.
-            cursor.execute("UPDATE punches SET punch_out_time = ? WHERE id = ?",
-                           (current_time, punch_id))
-            conn.commit()
-            return True, time_diff
-        else:
-            return False, None
-
-def get_punches_for_period(start_time: datetime, end_time: datetime):
+        results = {user_id: _punch_out(cursor, user_id) for user_id in user_ids}
+        conn.commit()
+        return results
+
+def get_punches_for_period(start_time: datetime, end_time: datetime, db_path: str = None):
     """
     Retorna todos os registros de picagem de ponto dentro de um período específico.
     Ajusta a data de fim para incluir o dia inteiro.
+    O 'username' vem da tabela 'members' (nome atual, não o do momento da entrada).
+    Usa uma conexão apenas de leitura, separada da usada para registar pontos.
     """
     # Garante que a end_time inclua todo o último dia (até o último microssegundo)
     adjusted_end_time = end_time.replace(hour=23, minute=59, second=59, microsecond=999999)
 
-    with get_db_connection() as conn:
+    with closing(get_read_connection(db_path)) as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT user_id, username, punch_in_time, punch_out_time
-            FROM punches
-            WHERE punch_in_time BETWEEN ? AND ?  -- Filtra pela hora de entrada
-            AND punch_out_time IS NOT NULL       -- Apenas registros completos (com entrada e saída)
-            ORDER BY punch_in_time ASC           -- Ordena por hora de entrada
+            SELECT p.user_id, COALESCE(m.display_name, CAST(p.user_id AS TEXT)) AS username,
+                   p.punch_in_time, p.punch_out_time
+            FROM punches p
+            LEFT JOIN members m ON m.user_id = p.user_id
+            WHERE p.punch_in_time BETWEEN ? AND ?  -- Filtra pela hora de entrada
+            AND p.punch_out_time IS NOT NULL       -- Apenas registros completos (com entrada e saída)
+            ORDER BY p.punch_in_time ASC           -- Ordena por hora de entrada
         """, (start_time.isoformat(), adjusted_end_time.isoformat()))
         return cursor.fetchall()
 
@@ -111,44 +262,116 @@ def get_open_punches_for_auto_close():
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT id, user_id, username, punch_in_time
-            FROM punches
-            WHERE punch_out_time IS NULL
+            SELECT p.id, p.user_id, COALESCE(m.display_name, CAST(p.user_id AS TEXT)) AS username, p.punch_in_time
+            FROM punches p
+            LEFT JOIN members m ON m.user_id = p.user_id
+            WHERE p.punch_out_time IS NULL
         """)
         return cursor.fetchall()
 
+def _auto_punch_out(cursor, punch_id: int, auto_punch_out_time: datetime):
+    """Fecha um ponto aberto usando o cursor dado (sem commit)."""
+    cursor.execute("SELECT user_id, punch_in_time FROM punches WHERE id = ? AND punch_out_time IS NULL", (punch_id,))
+    punch = cursor.fetchone()
+    if not punch:
+        return # Já foi fechado entretanto (ex.: o utilizador saiu manualmente)
+    cursor.execute("UPDATE punches SET punch_out_time = ? WHERE id = ?",
+                   (auto_punch_out_time.isoformat(), punch_id))
+    punch_in_time = datetime.fromisoformat(punch['punch_in_time'])
+    _add_duty_seconds(cursor, punch['user_id'], punch_in_time, (auto_punch_out_time - punch_in_time).total_seconds())
+
 def auto_record_punch_out(punch_id: int, auto_punch_out_time: datetime):
     """
     Registra uma saída automática para um registro de ponto específico.
     """
+    with get_db_connection() as conn:
+        _auto_punch_out(conn.cursor(), punch_id, auto_punch_out_time)
+        conn.commit()
+
+def auto_record_punch_outs(punch_outs: list[tuple[int, datetime]]):
+    """Versão em lote de auto_record_punch_out: [(punch_id, hora de saída), ...] numa única transação."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("UPDATE punches SET punch_out_time = ? WHERE id = ?",
-                       (auto_punch_out_time.isoformat(), punch_id))
+        for punch_id, auto_punch_out_time in punch_outs:
+            _auto_punch_out(cursor, punch_id, auto_punch_out_time)
+        conn.commit()
+
+def get_active_punch_start(user_id: int) -> datetime | None:
+    """Retorna a hora de entrada do ponto aberto do utilizador, ou None se não estiver em serviço."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT punch_in_time FROM punches WHERE user_id = ? AND punch_out_time IS NULL ORDER BY id DESC LIMIT 1", (user_id,))
+        row = cursor.fetchone()
+        return datetime.fromisoformat(row['punch_in_time']) if row else None
+
+def get_duty_seconds(user_id: int, start_day: date, end_day: date) -> float:
+    """
+    Retorna os segundos em serviço (pontos fechados) do utilizador entre start_day e end_day, inclusive.
+    Usa a soma acumulada por dia: são apenas duas consultas pelo índice, sem percorrer os registos.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        totals = []
+        for day in (end_day, start_day - timedelta(days=1)):
+            cursor.execute("SELECT cumulative_seconds FROM duty_daily_totals WHERE user_id = ? AND day <= ? ORDER BY day DESC LIMIT 1",
+                           (user_id, day.isoformat()))
+            row = cursor.fetchone()
+            totals.append(row[0] if row else 0.0)
+        return max(0.0, totals[0] - totals[1])
+
+# --- Funções para a tabela de membros ---
+
+def upsert_members(members: list[tuple[int, str, datetime]]):
+    """
+    Insere/atualiza vários membros de uma só vez: [(user_id, display_name, updated_at), ...].
+    Um nome mais antigo nunca substitui um mais recente.
+    """
+    if not members:
+        return
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO members (user_id, display_name, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                display_name = excluded.display_name,
+                updated_at = excluded.updated_at
+            WHERE excluded.updated_at >= members.updated_at
+        """, [(user_id, display_name, updated_at.isoformat()) for user_id, display_name, updated_at in members])
         conn.commit()
 
 # --- Funções para o banco de dados de tickets ---
 
+def _add_ticket(cursor, channel_id: int, creator_id: int, creator_name: str, category: str) -> bool:
+    created_at = datetime.now().isoformat()
+    try:
+        cursor.execute("INSERT INTO tickets (channel_id, creator_id, creator_name, category, created_at) VALUES (?, ?, ?, ?, ?)",
+                  (channel_id, creator_id, creator_name, category, created_at))
+        logger.debug("Ticket %s (Criador: %s, Categoria: %s) adicionado ao DB.", channel_id, creator_name, category)
+        return True
+    except sqlite3.IntegrityError:
+        logger.warning("Ticket para o canal %s já existe no DB (UNIQUE constraint failed).", channel_id)
+        return False
+
 def add_ticket_to_db(channel_id: int, creator_id: int, creator_name: str, category: str):
+    with get_db_connection() as conn:
+        success = _add_ticket(conn.cursor(), channel_id, creator_id, creator_name, category)
+        conn.commit()
+        return success
+
+def add_tickets_to_db(tickets: list[tuple[int, int, str, str]]) -> list[bool]:
+    """Versão em lote de add_ticket_to_db: [(channel_id, creator_id, creator_name, category), ...]."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        created_at = datetime.now().isoformat()
-        try:
-            cursor.execute("INSERT INTO tickets (channel_id, creator_id, creator_name, category, created_at) VALUES (?, ?, ?, ?, ?)",
-                      (channel_id, creator_id, creator_name, category, created_at))
-            conn.commit()
-            print(f"DEBUG: Ticket {channel_id} (Criador: {creator_name}, Categoria: {category}) adicionado ao DB.")
-            return True
-        except sqlite3.IntegrityError:
-            print(f"DEBUG: Erro: Ticket para o canal {channel_id} já existe no DB (UNIQUE constraint failed).")
-            return False
+        results = [_add_ticket(cursor, *ticket) for ticket in tickets]
+        conn.commit()
+        return results
 
 def remove_ticket_from_db(channel_id: int):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM tickets WHERE channel_id = ?", (channel_id,))
         conn.commit()
-        print(f"DEBUG: Ticket para o canal {channel_id} removido do DB.")
+        logger.debug("Ticket para o canal %s removido do DB.", channel_id)
 
 def get_all_open_tickets():
     with get_db_connection() as conn:
@@ -157,3 +380,47 @@ def get_all_open_tickets():
         tickets = cursor.fetchall()
         # Retorna uma lista de dicionários para facilitar o acesso
         return [{'channel_id': t['channel_id'], 'creator_id': t['creator_id'], 'creator_name': t['creator_name'], 'category': t['category'], 'created_at': t['created_at']} for t in tickets]
+
+# --- Funções para tarefas agendadas ---
+
+def get_job_last_run(job_name: str) -> datetime | None:
+    """
+    Retorna a marca da última execução (agendada) de uma tarefa, ou None se ela nunca correu.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_run_time FROM scheduled_jobs WHERE job_name = ?", (job_name,))
+        row = cursor.fetchone()
+        if row and row['last_run_time']:
+            return datetime.fromisoformat(row['last_run_time'])
+        return None
+
+def init_job_watermark(job_name: str, last_run_time: datetime) -> datetime:
+    """
+    Cria o registo da tarefa com a marca indicada, caso ainda não exista.
+    Retorna a marca efetivamente guardada (a existente prevalece).
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO scheduled_jobs (job_name, last_run_time) VALUES (?, ?)",
+                       (job_name, last_run_time.isoformat()))
+        conn.commit()
+        cursor.execute("SELECT last_run_time FROM scheduled_jobs WHERE job_name = ?", (job_name,))
+        return datetime.fromisoformat(cursor.fetchone()['last_run_time'])
+
+def claim_job_run(job_name: str, expected_last_run: datetime, run_time: datetime) -> bool:
+    """
+    Avança a marca da tarefa de 'expected_last_run' para 'run_time' de forma atómica.
+    Retorna True se esta chamada reivindicou a execução, False se outra já o tinha feito.
+    Como a marca é avançada ANTES da entrega, cada execução acontece no máximo uma vez,
+    mesmo que o bot reinicie a meio.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE scheduled_jobs
+            SET last_run_time = ?, claimed_at = ?
+            WHERE job_name = ? AND last_run_time = ?
+        """, (run_time.isoformat(), datetime.now().isoformat(), job_name, expected_last_run.isoformat()))
+        conn.commit()
+        return cursor.rowcount == 1
@@ -0,0 +1,214 @@
+"""
+Diagnóstico do loop de eventos: deteção de callbacks lentos, monitor de atraso do loop,
+profiler por amostragem (ou cProfile) e diferenças de memória com tracemalloc.
+Usado pelo DiagnosticsCog (!profile) e pelo loadtest.py; não usa o discord.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+# Importa configurações do nosso módulo config
+from config import (ASYNCIO_DEBUG, SLOW_CALLBACK_THRESHOLD_SECONDS, LOOP_LAG_CHECK_INTERVAL_SECONDS,
+                    LOOP_LAG_WARN_SECONDS, PROFILE_SAMPLE_INTERVAL_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+# Número de entradas em cada secção do relatório de profiling
+PROFILE_TOP_ENTRIES = 25
+# Amostras de atraso do loop guardadas (a ~2 por segundo: cerca de uma hora)
+LOOP_LAG_HISTORY_SIZE = 7200
+
+def configure_slow_callbacks(loop: asyncio.AbstractEventLoop, enabled: bool = ASYNCIO_DEBUG,
+                             threshold: float = SLOW_CALLBACK_THRESHOLD_SECONDS) -> bool:
+    """
+    Ativa o modo de depuração do asyncio, que regista (logger 'asyncio', nível WARNING) cada callback
+    que ocupe o loop mais do que 'threshold' segundos. Retorna o estado anterior do modo de depuração.
+    """
+    previous = loop.get_debug()
+    if enabled:
+        loop.slow_callback_duration = threshold
+        loop.set_debug(True)
+        logger.info("Deteção de callbacks lentos ativa (limite: %.3fs).", threshold)
+    return previous
+
+def percentile(values: list, pct: float) -> float:
+    """Percentil por ordenação simples."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class LoopLagMonitor:
+    """
+    Mede o atraso do loop de eventos: quanto tempo um sleep curto demora além do pedido.
+    Regista um aviso sempre que o atraso passa de 'warn_threshold' (None: sem avisos).
+    """
+    def __init__(self, interval: float = LOOP_LAG_CHECK_INTERVAL_SECONDS, warn_threshold: float | None = LOOP_LAG_WARN_SECONDS,
+                 history_size: int | None = LOOP_LAG_HISTORY_SIZE):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.samples = deque(maxlen=history_size) # (time.monotonic(), atraso em segundos)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self.samples.append((now, lag))
+            if self.warn_threshold is not None and lag >= self.warn_threshold:
+                logger.warning("Loop de eventos atrasado %.3fs.", lag, extra={'loop_lag_seconds': round(lag, 4)})
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def lags(self, since: float = 0.0) -> list[float]:
+        """Atrasos (em segundos) medidos desde 'since' (time.monotonic())."""
+        return [lag for moment, lag in self.samples if moment >= since]
+
+    def stats(self, since: float = 0.0) -> dict:
+        """Resumo ({'samples', 'p50', 'p99', 'max'}, em segundos) das medições desde 'since' (time.monotonic())."""
+        lags = self.lags(since)
+        return {'samples': len(lags), 'p50': percentile(lags, 50), 'p99': percentile(lags, 99), 'max': max(lags, default=0.0)}
+
+def _frame_label(frame, with_line: bool = False) -> str:
+    code = frame.f_code
+    label = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+    return f"{label}:{frame.f_lineno}" if with_line else label
+
+class StackSampler:
+    """
+    Profiler por amostragem: uma thread lê periodicamente a pilha da thread do loop de eventos.
+    Custo baixo e constante, e apanha também o tempo passado em chamadas bloqueantes (ex.: sqlite3).
+    As amostras em que o loop está à espera de eventos (selector) contam como inativas.
+    """
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter() # pilha (da raiz para a folha) -> amostras
+        self.leaves = Counter() # função:linha onde o loop estava -> amostras
+        self.idle_samples = 0
+        self.total_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        self.total_samples += 1
+        if os.path.basename(frame.f_code.co_filename) == "selectors.py":
+            self.idle_samples += 1
+            return
+        self.leaves[_frame_label(frame, with_line=True)] += 1
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        self.stacks[tuple(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, top: int = PROFILE_TOP_ENTRIES) -> str:
+        busy = self.total_samples - self.idle_samples
+        lines = [f"Amostras: {self.total_samples} (intervalo {self.interval * 1000:.1f} ms), "
+                 f"loop ocupado em {busy} ({100 * busy / max(1, self.total_samples):.1f}%)."]
+        lines.append("")
+        lines.append(f"== Funções mais quentes (folha da pilha, top {top}) ==")
+        for label, count in self.leaves.most_common(top):
+            lines.append(f"{count:7d} {100 * count / max(1, busy):5.1f}%  {label}")
+        lines.append("")
+        lines.append(f"== Caminhos mais quentes (pilha completa, top {top}) ==")
+        for stack, count in self.stacks.most_common(top):
+            lines.append(f"{count:7d} {100 * count / max(1, busy):5.1f}%  {' > '.join(stack[-12:])}")
+        return "\n".join(lines)
+
+def _cprofile_report(profiler: cProfile.Profile, top: int = PROFILE_TOP_ENTRIES) -> str:
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+    return output.getvalue()
+
+def _memory_report(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top: int = PROFILE_TOP_ENTRIES) -> str:
+    # Ignora as alocações do próprio profiling (tracemalloc, este módulo) e das importações
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+               tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+    growth = sum(stat.size_diff for stat in differences)
+    lines = [f"Variação total: {growth / 1024:+.1f} KB", ""]
+    for stat in differences[:top]:
+        lines.append(str(stat))
+    return "\n".join(lines)
+
+async def profile_event_loop(seconds: float, mode: str = "sampling", lag_monitor: LoopLagMonitor = None) -> str:
+    """
+    Faz o profiling do loop de eventos durante 'seconds' e retorna o relatório em texto:
+    caminhos mais quentes (amostragem ou cProfile), atraso do loop na janela e diferenças de memória.
+    Tem de ser chamada a partir do próprio loop (a thread medida é a que a chama).
+    Os snapshots do tracemalloc e a sua comparação correm numa thread: num heap grande demoram
+    e, no loop, distorceriam o próprio profiling.
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    memory_before = await asyncio.to_thread(tracemalloc.take_snapshot)
+    window_start = time.monotonic()
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable() # Só mede a thread atual: a do loop de eventos
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        hot_paths = _cprofile_report(profiler)
+    else:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        hot_paths = sampler.report()
+
+    memory_after = await asyncio.to_thread(tracemalloc.take_snapshot)
+    if started_tracing:
+        tracemalloc.stop()
+    memory_report = await asyncio.to_thread(_memory_report, memory_before, memory_after)
+
+    sections = [f"Profiling do loop de eventos ({mode}) durante {seconds:g}s", "", hot_paths, ""]
+    if lag_monitor is not None:
+        lag = lag_monitor.stats(since=window_start)
+        sections.append("== Atraso do loop na janela ==")
+        sections.append(f"{lag['samples']} medições: p50 {lag['p50'] * 1000:.1f} ms, p99 {lag['p99'] * 1000:.1f} ms, máx {lag['max'] * 1000:.1f} ms")
+        sections.append("")
+    sections.append("== Memória (tracemalloc: alocações vivas criadas na janela) ==" if started_tracing
+                    else "== Memória (tracemalloc: diferença entre o início e o fim da janela) ==")
+    sections.append(memory_report)
+    return "\n".join(sections) + "\n"
@@ -0,0 +1,166 @@
+"""
+Ligação ao gateway do Discord: intents, cache de membros e medição de recursos.
+No modo lean (LEAN_GATEWAY_MODE) o bot pede apenas os intents que os cogs declaram em
+REQUIRED_INTENTS, não recebe presences nem a lista completa de membros, e obtém os membros
+a pedido (fetch_member), guardando apenas os que aparecem em interações.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import discord
+
+try:
+    import resource # Apenas Unix: usado como alternativa a /proc para medir a memória
+except ImportError:
+    resource = None
+
+from config import LEAN_MEMBER_CACHE_SIZE, GATEWAY_STATS_WINDOW_SECONDS, GATEWAY_STATS_FILE
+
+logger = logging.getLogger(__name__)
+
+# Intents usados pelo próprio main.py (comandos com prefixo, como !mascote)
+BASE_INTENTS = discord.Intents(guilds=True, guild_messages=True, message_content=True)
+
+def full_intents() -> discord.Intents:
+    """Intents do modo completo (o comportamento anterior do bot)."""
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    intents.reactions = True
+    intents.presences = True
+    return intents
+
+def declared_intents(extensions: list[str]) -> discord.Intents:
+    """
+    União de BASE_INTENTS com o REQUIRED_INTENTS de cada extensão (ex.: 'cogs.punch_card').
+    Uma extensão que não declare intents é tratada como precisando do modo completo.
+    """
+    intents = discord.Intents(BASE_INTENTS.value)
+    for extension in extensions:
+        try:
+            module = importlib.import_module(extension)
+        except Exception:
+            logger.exception("Não foi possível ler os intents de %s; será ignorada no cálculo.", extension)
+            continue
+        required = getattr(module, "REQUIRED_INTENTS", None)
+        if required is None:
+            logger.warning("%s não declara REQUIRED_INTENTS; a usar os intents do modo completo.", extension)
+            required = full_intents()
+        intents.value |= required.value
+    return intents
+
+def member_cache_flags(intents: discord.Intents, lean: bool) -> discord.MemberCacheFlags:
+    """No modo lean o discord.py não guarda membros: a cache fica a cargo de InteractionMemberCache."""
+    return discord.MemberCacheFlags.none() if lean else discord.MemberCacheFlags.from_intents(intents)
+
+class InteractionMemberCache:
+    """
+    Cache LRU dos membros vistos em interações (botões, comandos) ou obtidos a pedido.
+    Substitui a cache completa de membros do discord.py no modo lean.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._members = OrderedDict() # (guild_id, user_id) -> discord.Member
+
+    def note(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        self._members[key] = member
+        self._members.move_to_end(key)
+        while len(self._members) > self.max_size:
+            self._members.popitem(last=False)
+
+    def get(self, guild_id: int, user_id: int) -> discord.Member | None:
+        member = self._members.get((guild_id, user_id))
+        if member is not None:
+            self._members.move_to_end((guild_id, user_id))
+        return member
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+# Instância partilhada pelo bot e pelos cogs
+interaction_members = InteractionMemberCache(LEAN_MEMBER_CACHE_SIZE)
+
+async def get_or_fetch_member(guild: discord.Guild, user_id: int) -> discord.Member | None:
+    """
+    Procura um membro na cache do discord.py, depois na cache de interações e, por fim, na API.
+    Retorna None se o utilizador já não estiver no servidor ou se a API falhar.
+    """
+    member = guild.get_member(user_id) or interaction_members.get(guild.id, user_id)
+    if member is not None:
+        return member
+    try:
+        member = await guild.fetch_member(user_id)
+    except discord.NotFound:
+        return None
+    except discord.HTTPException:
+        logger.warning("Não foi possível obter o membro %s do servidor %s.", user_id, guild.id, exc_info=True)
+        return None
+    interaction_members.note(member)
+    return member
+
+# --- Medição de recursos (RSS/CPU) ---
+
+def current_rss_mb() -> float:
+    """Memória residente atual do processo (MB). Sem /proc, usa o pico (ru_maxrss)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0.0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KB em Linux
+
+def _load_stats() -> dict:
+    try:
+        with open(GATEWAY_STATS_FILE, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_stats(stats: dict):
+    with open(GATEWAY_STATS_FILE, 'w') as f:
+        json.dump(stats, f, indent=2)
+
+async def report_gateway_usage(bot: discord.Client, lean: bool, window_seconds: int = GATEWAY_STATS_WINDOW_SECONDS):
+    """
+    Mede o RSS e o CPU médio do processo durante os primeiros 'window_seconds' após o arranque,
+    guarda a medição do modo atual e regista a comparação com a última medição do outro modo.
+    """
+    mode, other_mode = ("lean", "completo") if lean else ("completo", "lean")
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    await asyncio.sleep(window_seconds)
+    cpu_percent = 100 * (time.process_time() - cpu_start) / (time.monotonic() - wall_start)
+
+    sample = {
+        "rss_mb": round(current_rss_mb(), 1),
+        "cpu_percent": round(cpu_percent, 2),
+        "cached_members": sum(len(guild.members) for guild in bot.guilds) + len(interaction_members),
+        "intents": bot.intents.value,
+        "measured_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    stats = _load_stats()
+    stats[mode] = sample
+    try:
+        _save_stats(stats)
+    except OSError:
+        logger.exception("Não foi possível guardar a medição do gateway em %s.", GATEWAY_STATS_FILE)
+
+    logger.info("Gateway em modo %s: RSS %.1f MB, CPU %.2f%%, %d membros em cache (primeiros %ds).",
+                mode, sample["rss_mb"], sample["cpu_percent"], sample["cached_members"], window_seconds,
+                extra={"gateway_mode": mode, **{key: sample[key] for key in ("rss_mb", "cpu_percent", "cached_members")}})
+    other = stats.get(other_mode)
+    if other:
+        logger.info("Comparação com o modo %s (medido em %s): RSS %.1f MB (%+.1f MB), CPU %.2f%% (%+.2f pp), %d membros em cache.",
+                    other_mode, other["measured_at"], other["rss_mb"], sample["rss_mb"] - other["rss_mb"],
+                    other["cpu_percent"], sample["cpu_percent"] - other["cpu_percent"], other["cached_members"])
+    else:
+        logger.info("Ainda não há medição do modo %s para comparar (arranque com LEAN_GATEWAY_MODE=%s para a obter).",
+                    other_mode, "true" if other_mode == "lean" else "false")
@@ -0,0 +1,71 @@
+"""
+Reload a quente de cogs (!reload), sem reiniciar o bot nem a ligação ao gateway.
+Antes do reload, cada cog da extensão pode entregar o seu estado em 'export_state()' (caches,
+agendadores, recursos como o pool de relatórios); a nova instância recebe-o em 'import_state(state)'.
+Se o novo módulo falhar, o discord.py volta a carregar o módulo antigo e o estado é entregue a essa instância.
+Só o módulo do cog é recarregado; os módulos auxiliares (database, scheduler, report_worker, ...) não.
+"""
+import logging
+import sys
+import time
+
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+def _extension_cogs(bot: commands.Bot, extension: str) -> dict:
+    """Cogs (nome -> instância) definidos no módulo da extensão."""
+    return {name: cog for name, cog in bot.cogs.items() if type(cog).__module__ == extension}
+
+def _hand_over(bot: commands.Bot, extension: str, states: dict) -> list[str]:
+    """Entrega o estado exportado às novas instâncias. Retorna os nomes dos cogs que o receberam."""
+    received = []
+    for name, state in states.items():
+        cog = bot.get_cog(name)
+        if cog is None or not hasattr(cog, "import_state"):
+            logger.warning("Estado do cog %s descartado: a nova versão de %s não o aceita.", name, extension)
+            continue
+        try:
+            cog.import_state(state)
+            received.append(name)
+        except Exception:
+            logger.exception("Erro ao entregar o estado ao cog %s.", name)
+    return received
+
+def missing_intents(bot: commands.Bot, extension: str) -> list[str]:
+    """Intents declarados pela extensão (REQUIRED_INTENTS) que a ligação atual não tem."""
+    required = getattr(sys.modules.get(extension), "REQUIRED_INTENTS", None)
+    if required is None:
+        return []
+    missing = discord.Intents(required.value & ~bot.intents.value)
+    return [name for name, enabled in missing if enabled]
+
+async def reload_with_state(bot: commands.Bot, extension: str) -> dict:
+    """
+    Recarrega 'extension' (ex.: 'cogs.punch_card') passando o estado das instâncias antigas às novas.
+    Retorna {'duration_seconds', 'handed_over', 'missing_intents'}.
+    Em caso de erro no novo módulo, repõe o módulo antigo (com o estado) e volta a levantar a exceção.
+    """
+    if extension not in bot.extensions:
+        raise commands.ExtensionNotLoaded(extension)
+
+    started = time.perf_counter()
+    states = {name: cog.export_state() for name, cog in _extension_cogs(bot, extension).items() if hasattr(cog, "export_state")}
+    try:
+        await bot.reload_extension(extension)
+    except Exception:
+        # O discord.py já voltou a executar o setup() do módulo antigo: a instância reposta recebe o estado
+        received = _hand_over(bot, extension, states)
+        logger.exception("Reload de %s falhou; versão anterior reposta (estado entregue a: %s).", extension, ", ".join(received) or "nenhum")
+        raise
+
+    received = _hand_over(bot, extension, states)
+    result = {
+        'duration_seconds': time.perf_counter() - started,
+        'handed_over': received,
+        'missing_intents': missing_intents(bot, extension),
+    }
+    logger.info("Extensão %s recarregada em %.1f ms (estado entregue a: %s).", extension,
+                result['duration_seconds'] * 1000, ", ".join(received) or "nenhum")
+    return result
@@ -0,0 +1,297 @@
+"""
+Harness de teste de carga offline para o PunchCardView.
+
+Simula milhares de cliques nos botões 'Entrar em Serviço' / 'Sair de Serviço' sem tocar no Discord:
+Interaction, Member e canais são substituídos por objetos falsos que registam a latência de resposta.
+Todos os cliques correm em simultâneo num único loop de eventos, contra uma base de dados temporária.
+
+Uso:
+    python loadtest.py --pattern storm --users 500
+    python loadtest.py --pattern mixed --users 200 --rounds 3 --api-latency-ms 80
+    python loadtest.py --pattern storm --history-punches 200000 --background-report  # p99 sem e com um relatório anual
+    python loadtest.py --backend memory  # sem disco, para isolar o custo do próprio bot
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import database
+import storage
+from report_worker import compute_report, init_report_worker, summarize_records
+from diagnostics import LoopLagMonitor, percentile
+
+# Padrões de cliques disponíveis
+PATTERNS = ("storm", "doubleclick", "idle", "mixed")
+
+# --- Objetos falsos do Discord ---
+
+class FakeMember:
+    """Substituto mínimo de discord.Member (apenas o que os callbacks usam)."""
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.display_name = f"Agente {user_id}"
+
+class FakeInteractionResponse:
+    """Regista o momento em que o bot responde (time-to-ack) e simula a latência da API."""
+    def __init__(self, interaction, api_latency: float):
+        self._interaction = interaction
+        self._api_latency = api_latency
+        self.acked_at = None
+        self.content = None
+
+    async def send_message(self, content=None, **kwargs):
+        self.acked_at = time.perf_counter()
+        self.content = content
+        await asyncio.sleep(self._api_latency)
+
+class FakeInteraction:
+    """Substituto de discord.Interaction para um clique num botão."""
+    def __init__(self, member: FakeMember, api_latency: float, created_at: float = None):
+        self.user = member
+        self.created_at = created_at or time.perf_counter()
+        self.response = FakeInteractionResponse(self, api_latency)
+
+class FakeChannel:
+    """Canal de logs falso: conta as mensagens enviadas e simula a latência da API."""
+    def __init__(self, api_latency: float):
+        self._api_latency = api_latency
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(self._api_latency)
+        self.sent += 1
+
+class FakeBot:
+    def __init__(self, channel: FakeChannel):
+        self._channel = channel
+
+    def get_channel(self, channel_id):
+        return self._channel
+
+class FakeCog:
+    """O PunchCardView só precisa de 'cog.bot.get_channel' e de 'cog.invalidate_hours_cache'."""
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+
+    def invalidate_hours_cache(self, user_id: int):
+        pass
+
+# --- Padrões de cliques ---
+
+class LoadTest:
+    def __init__(self, users: int, rounds: int, api_latency: float, idle_seconds: float, seed: int, background_report: bool = False):
+        self.users = [FakeMember(100000 + i) for i in range(users)]
+        self.rounds = rounds
+        self.api_latency = api_latency
+        self.idle_seconds = idle_seconds
+        self.random = random.Random(seed)
+        self.channel = FakeChannel(api_latency)
+        self.background_report = background_report
+        self.reports_completed = 0
+        self.view = None
+        self.ack_latencies = []
+        self.clicks = 0
+        self.errors = 0
+
+    async def click(self, member: FakeMember, button: str, issued_at: float = None):
+        """
+        Dispara o callback real de um botão e regista o time-to-ack.
+        'issued_at' é o momento do clique; num pico, inclui o tempo em fila no loop.
+        """
+        interaction = FakeInteraction(member, self.api_latency, issued_at)
+        item = getattr(self.view, f"{button}_button_callback")
+        self.clicks += 1
+        try:
+            await item.callback(interaction)
+        except Exception as e:
+            self.errors += 1
+            print(f"Erro no clique {button} de {member.id}: {e}")
+            return
+        if interaction.response.acked_at is not None:
+            self.ack_latencies.append(interaction.response.acked_at - interaction.created_at)
+
+    async def storm(self):
+        """Troca de turno: todos entram ao mesmo tempo e depois todos saem ao mesmo tempo."""
+        for _ in range(self.rounds):
+            for button in ("punch_in", "punch_out"):
+                issued_at = time.perf_counter()
+                await asyncio.gather(*(self.click(m, button, issued_at) for m in self.users))
+
+    async def doubleclick(self):
+        """Cada utilizador carrega duas vezes seguidas no mesmo botão (cliques duplicados)."""
+        for _ in range(self.rounds):
+            for button in ("punch_in", "punch_out"):
+                issued_at = time.perf_counter()
+                await asyncio.gather(*(self.click(m, button, issued_at) for m in self.users for _ in range(2)))
+
+    async def idle(self):
+        """Utilizadores espalhados no tempo, com longos períodos de inatividade entre cliques."""
+        async def user_session(member):
+            for _ in range(self.rounds):
+                await asyncio.sleep(self.random.uniform(0, self.idle_seconds))
+                await self.click(member, "punch_in")
+                await asyncio.sleep(self.random.uniform(0, self.idle_seconds))
+                await self.click(member, "punch_out")
+        await asyncio.gather(*(user_session(m) for m in self.users))
+
+    async def mixed(self):
+        """Mistura dos três padrões em simultâneo, cada um com um terço dos utilizadores."""
+        third = max(1, len(self.users) // 3)
+        groups = [self.users[:third], self.users[third:2 * third], self.users[2 * third:]]
+        runners = []
+        for pattern, group in zip(("storm", "doubleclick", "idle"), groups):
+            sub = LoadTest.__new__(LoadTest)
+            sub.__dict__.update(self.__dict__) # Partilha a view, o canal e as medições
+            sub.users = group
+            sub.clicks = sub.errors = 0
+            runners.append((sub, getattr(sub, pattern)))
+        await asyncio.gather(*(run() for _, run in runners))
+        for sub, _ in runners:
+            self.clicks += sub.clicks
+            self.errors += sub.errors
+
+    async def _run_report(self, pool: ProcessPoolExecutor, start: datetime, end: datetime):
+        """Gera um relatório do período como o ReportsCog: no pool de processos (sqlite) ou numa thread (memória)."""
+        loop = asyncio.get_running_loop()
+        if storage.store.db_path:
+            await loop.run_in_executor(pool, compute_report, storage.store.db_path, start, end)
+        else:
+            await loop.run_in_executor(None, lambda: summarize_records(storage.store.get_punches_for_period(start, end)))
+
+    async def _background_report(self, pool: ProcessPoolExecutor) -> float:
+        """Gera um relatório anual em paralelo com os cliques. Retorna a duração em segundos."""
+        end = datetime.now()
+        start = time.perf_counter()
+        await self._run_report(pool, end - timedelta(days=365), end)
+        self.reports_completed += 1
+        return time.perf_counter() - start
+
+    async def _measure(self, pattern: str, until: asyncio.Task = None) -> dict:
+        """
+        Corre o padrão e mede o time-to-ack e o atraso do loop.
+        Com 'until', repete o padrão até essa tarefa terminar (os cliques cobrem toda a sua duração).
+        """
+        first_ack, first_click = len(self.ack_latencies), self.clicks
+        # Medição fina (10 ms), sem avisos no log e sem limite de histórico
+        monitor = LoopLagMonitor(interval=0.01, warn_threshold=None, history_size=None)
+        monitor.start()
+        start = time.perf_counter()
+        await getattr(self, pattern)()
+        while until is not None and not until.done():
+            await getattr(self, pattern)()
+        elapsed = time.perf_counter() - start
+        monitor.stop()
+        return {
+            "elapsed": elapsed,
+            "clicks": self.clicks - first_click,
+            "acks": self.ack_latencies[first_ack:],
+            "loop_lag": monitor.lags(),
+        }
+
+    async def run(self, pattern: str) -> dict:
+        """
+        Retorna {'phases': {nome: medições}, 'report_seconds'}.
+        Com --background-report há duas fases com o mesmo padrão: sem relatório (referência) e com um
+        relatório anual a correr até ao fim. O pool é aquecido antes de medir, como no bot em produção.
+        """
+        # Importado aqui: o cog usa o 'store' escolhido em main() (--backend)
+        from cogs.punch_card import PunchCardView
+        self.view = PunchCardView(FakeCog(FakeBot(self.channel)))
+        if not self.background_report:
+            return {"phases": {pattern: await self._measure(pattern)}, "report_seconds": None}
+
+        pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=init_report_worker)
+        try:
+            # Aquecimento: arranque do processo e importações fora da janela medida
+            now = datetime.now()
+            await self._run_report(pool, now, now)
+            phases = {"sem relatório": await self._measure(pattern)}
+            report_task = asyncio.create_task(self._background_report(pool))
+            phases["com relatório"] = await self._measure(pattern, until=report_task)
+            report_seconds = await report_task
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return {"phases": phases, "report_seconds": report_seconds}
+
+def seed_history(db_path: str, punches: int, users: int):
+    """Preenche a base de dados com um ano de registos fechados (para relatórios pesados)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        start = datetime.now() - timedelta(days=365)
+        step = timedelta(days=365) / max(1, punches)
+        rows = []
+        for i in range(punches):
+            punch_in = start + step * i
+            rows.append((1 + i % max(1, users), punch_in.isoformat(), (punch_in + timedelta(hours=2)).isoformat()))
+        conn.executemany("INSERT INTO punches (user_id, punch_in_time, punch_out_time) VALUES (?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+def check_consistency() -> list:
+    """Retorna [(user_id, pontos abertos)] dos utilizadores com mais de um ponto aberto (deve ser vazio)."""
+    open_counts = {}
+    for punch in storage.store.get_open_punches_for_auto_close():
+        open_counts[punch['user_id']] = open_counts.get(punch['user_id'], 0) + 1
+    return [(user_id, count) for user_id, count in open_counts.items() if count > 1]
+
+def print_report(pattern: str, test: LoadTest, result: dict, duplicates: list):
+    print("------")
+    print(f"Padrão: {pattern} | Utilizadores: {len(test.users)} | Rondas: {test.rounds}")
+    for name, phase in result["phases"].items():
+        acks, lag = phase["acks"], phase["loop_lag"]
+        print(f"[{name}] Cliques: {phase['clicks']} em {phase['elapsed']:.2f}s ({phase['clicks'] / phase['elapsed']:.1f} cliques/s)")
+        if acks:
+            print(f"[{name}] Time-to-ack: p50 {percentile(acks, 50) * 1000:.1f}ms | p99 {percentile(acks, 99) * 1000:.1f}ms | máx {max(acks) * 1000:.1f}ms")
+        if lag:
+            print(f"[{name}] Atraso do loop: média {statistics.mean(lag) * 1000:.1f}ms | p99 {percentile(lag, 99) * 1000:.1f}ms | máx {max(lag) * 1000:.1f}ms")
+    print(f"Erros: {test.errors} | Mensagens de log enviadas: {test.channel.sent}")
+    if test.background_report:
+        baseline, loaded = result["phases"]["sem relatório"]["acks"], result["phases"]["com relatório"]["acks"]
+        print(f"Relatório anual concluído em paralelo em {result['report_seconds']:.2f}s "
+              f"({test.reports_completed} concluído(s)).")
+        if baseline and loaded:
+            p99_baseline, p99_loaded = percentile(baseline, 99) * 1000, percentile(loaded, 99) * 1000
+            print(f"Time-to-ack p99: {p99_baseline:.1f}ms sem relatório -> {p99_loaded:.1f}ms com relatório ({p99_loaded - p99_baseline:+.1f}ms)")
+    if duplicates:
+        print(f"❌ INCONSISTÊNCIA: {len(duplicates)} utilizadores com pontos abertos duplicados: {duplicates[:10]}")
+    else:
+        print("✅ Consistência: nenhum ponto aberto duplicado.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga offline dos botões de picagem de ponto.")
+    parser.add_argument("--pattern", choices=PATTERNS, default="mixed", help="Padrão de cliques a simular.")
+    parser.add_argument("--users", type=int, default=300, help="Número de utilizadores simulados.")
+    parser.add_argument("--rounds", type=int, default=2, help="Quantas vezes cada padrão é repetido.")
+    parser.add_argument("--api-latency-ms", type=float, default=50.0, help="Latência simulada da API do Discord.")
+    parser.add_argument("--idle-seconds", type=float, default=2.0, help="Intervalo máximo entre cliques no padrão 'idle'.")
+    parser.add_argument("--seed", type=int, default=1234, help="Semente para reprodutibilidade.")
+    parser.add_argument("--backend", choices=sorted(storage.BACKENDS), default="sqlite", help="Backend de armazenamento a usar.")
+    parser.add_argument("--history-punches", type=int, default=0, help="Registos históricos a inserir antes do teste (apenas sqlite).")
+    parser.add_argument("--background-report", action="store_true", help="Mede o padrão sem e com um relatório anual a correr em paralelo.")
+    args = parser.parse_args()
+    if args.history_punches and args.backend != "sqlite":
+        parser.error("--history-punches só é suportado com --backend sqlite.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "loadtest.db")
+        database.DATABASE_NAME = db_path # Nunca toca no punch_card.db real
+        storage.store = storage.create_store(args.backend) # Antes de importar os cogs
+        storage.store.setup()
+        if args.history_punches:
+            seed_history(db_path, args.history_punches, args.users)
+
+        test = LoadTest(args.users, args.rounds, args.api_latency_ms / 1000, args.idle_seconds, args.seed, args.background_report)
+        result = asyncio.run(test.run(args.pattern))
+        print_report(args.pattern, test, result, check_consistency())
+
+if __name__ == '__main__':
+    main()
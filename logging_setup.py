@@ -0,0 +1,98 @@
+"""
+Configuração de logging do bot.
+Os módulos apenas colocam registos numa fila (QueueHandler); a formatação JSON e a escrita
+na consola/ficheiro acontecem numa thread separada (QueueListener), fora do loop de eventos.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime
+
+from config import LOG_LEVEL, LOG_MODULE_LEVELS, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT
+
+# Atributos padrão de um LogRecord; tudo o resto (passado via extra=...) entra no JSON
+_STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+# Usado para formatar tracebacks antes de o registo entrar na fila
+_exception_formatter = logging.Formatter()
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registo como uma linha JSON (ts, level, logger, msg e campos extra)."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que mantém a traceback separada da mensagem.
+    O QueueHandler padrão junta-as em 'msg'; aqui só se resolvem os argumentos (podem ser objetos mutáveis)
+    e a formatação JSON fica para a thread do QueueListener.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None # Tracebacks não são serializáveis entre threads/processos
+        return record
+
+def parse_module_levels(spec: str) -> dict[str, str]:
+    """Converte 'cogs.punch_card=DEBUG,scheduler=WARNING' em {módulo: nível}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+_listener = None
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Instala o QueueHandler no logger raiz e arranca o QueueListener (consola + ficheiro rotativo).
+    Pode ser chamada mais de uma vez: só configura na primeira.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonFormatter()
+    handlers = []
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+
+    if LOG_FILE:
+        file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES,
+                                                            backupCount=LOG_FILE_BACKUP_COUNT, encoding="utf-8")
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue() # Sem limite: colocar na fila nunca bloqueia o loop
+    root = logging.getLogger()
+    root.handlers[:] = [StructuredQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in parse_module_levels(LOG_MODULE_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop) # Escreve o que ainda estiver na fila ao terminar
+    return _listener
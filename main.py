@@ -2,27 +2,36 @@ import discord
 from discord.ext import commands
 import os
 import asyncio
+import logging
 
 # Importa configurações
-from config import TOKEN, PUNCH_CHANNEL_ID, WEEKLY_REPORT_CHANNEL_ID, ROLE_ID
+from config import TOKEN, PUNCH_CHANNEL_ID, WEEKLY_REPORT_CHANNEL_ID, ROLE_ID, LEAN_GATEWAY_MODE
 
-# Setup da base de dados
-from database import setup_database
+# Camada de armazenamento (backend escolhido no config.py)
+from storage import store
+# Logging assíncrono (fila + thread de escrita) em JSON
+from logging_setup import setup_logging
+# Intents, cache de membros e medição de recursos da ligação ao Discord
+from gateway import declared_intents, full_intents, member_cache_flags, interaction_members, report_gateway_usage
+# Reload a quente de cogs com passagem de estado
+from hot_reload import reload_with_state
 
-# Intents - Certifique-se de que estas estão ativadas no Discord Developer Portal!
-# MESSAGE_CONTENT é crucial para comandos de prefixo.
-# MEMBERS e PRESENCES são necessários para cogs como status_changer e funcionalidades que interagem com membros.
-intents = discord.Intents.default()
-intents.members = True
-intents.message_content = True
-intents.reactions = True
-intents.presences = True 
+logger = logging.getLogger(__name__)
 
-# Bot com prefixo "!"
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Cogs (extensões) a carregar: todos os ficheiros .py da pasta 'cogs' (ignora __init__.py e __pycache__)
+COGS_FOLDER = './cogs'
+EXTENSIONS = [f'cogs.{filename[:-3]}' for filename in sorted(os.listdir(COGS_FOLDER))
+              if filename.endswith('.py') and not filename.startswith('__')] if os.path.exists(COGS_FOLDER) else []
+
+_gateway_report_task = None
+
+async def remember_interaction_member(interaction: discord.Interaction):
+    """Guarda na cache os membros que usam botões/comandos (a única cache de membros no modo lean)."""
+    if isinstance(interaction.user, discord.Member):
+        interaction_members.note(interaction.user)
 
 # --- COMANDO COM PREFIXO (!mascote) ---
-@bot.command(name="mascote", help="Exibe a mascote atual da LSPD.")
+@commands.command(name="mascote", help="Exibe a mascote atual da LSPD.")
 async def hello(ctx):
     if not isinstance(ctx.author, discord.Member):
         await ctx.send("Este comando só pode ser usado num servidor.", ephemeral=True)
@@ -36,44 +45,103 @@ async def hello(ctx):
     else:
         await ctx.send("A atual mascote da LSPD é o SKIBIDI ZEKA!")
 
-# --- Evento on_ready ---
-@bot.event
-async def on_ready():
-    print(f'✅ Bot conectado como {bot.user.name} ({bot.user.id})')
-
-    # Configura base de dados (cria tabelas se não existirem)
-    setup_database()
-    print('📦 Base de dados configurada.')
+# --- COMANDO DE RELOAD A QUENTE (!reload) ---
+@commands.command(name="reload", help="Recarrega um cog sem reiniciar o bot, mantendo o seu estado. Uso: !reload <cog> (ex.: !reload punch_card)")
+@commands.has_permissions(administrator=True) # Apenas administradores podem usar
+async def reload_cog(ctx, cog_name: str):
+    extension = cog_name if cog_name.startswith('cogs.') else f'cogs.{cog_name}'
+    if extension not in ctx.bot.extensions:
+        loaded = ', '.join(sorted(name[len('cogs.'):] for name in ctx.bot.extensions if name.startswith('cogs.')))
+        await ctx.send(f"Cog `{cog_name}` não está carregado. Cogs carregados: {loaded or 'nenhum'}.", ephemeral=True)
+        return
 
-    # Carrega cogs
-    cogs_folder = './cogs'
-    if not os.path.exists(cogs_folder):
-        print(f"⚠️ Pasta '{cogs_folder}' não encontrada. Certifique-se de que seus cogs estão na subpasta 'cogs'.")
+    try:
+        result = await reload_with_state(ctx.bot, extension)
+    except Exception as e:
+        error = e.original if isinstance(e, commands.ExtensionFailed) else e
+        await ctx.send(f"❌ O reload de `{cog_name}` falhou e a versão anterior foi reposta: `{type(error).__name__}: {error}`", ephemeral=True)
         return
 
-    for filename in os.listdir(cogs_folder):
-        # Garante que apenas ficheiros .py válidos sejam carregados (ignora __init__.py e __pycache__)
-        if filename.endswith('.py') and not filename.startswith('__'):
+    message = f"♻️ Cog `{cog_name}` recarregado em `{result['duration_seconds'] * 1000:.1f} ms`"
+    message += f" (estado mantido: {', '.join(result['handed_over'])})." if result['handed_over'] else " (sem estado a manter)."
+    if result['missing_intents']:
+        message += (f"\n⚠️ A nova versão declara intents que a ligação atual não tem ({', '.join(result['missing_intents'])}); "
+                    "só ficam ativos após reiniciar o bot.")
+    await ctx.send(message, ephemeral=True)
+    logger.info("Admin %s recarregou o cog %s.", ctx.author, extension)
+
+def create_bot() -> commands.Bot:
+    """
+    Cria o bot, com os intents do modo configurado, e regista os comandos e eventos deste módulo.
+    Chamada apenas no arranque do bot: os processos 'spawn' dos pools de relatórios também importam
+    este módulo (como __mp_main__) e não devem importar os cogs nem criar um Bot.
+    """
+    # Intents - Certifique-se de que estas estão ativadas no Discord Developer Portal!
+    # No modo lean, apenas os intents declarados pelos cogs (REQUIRED_INTENTS) são pedidos: sem presences e sem
+    # a lista completa de membros. No modo completo, MEMBERS e PRESENCES continuam ativos como antes.
+    if LEAN_GATEWAY_MODE:
+        intents = declared_intents(EXTENSIONS)
+    else:
+        intents = full_intents()
+
+    # Bot com prefixo "!"
+    # No modo lean não há chunking dos servidores no arranque: os membros são obtidos a pedido (gateway.get_or_fetch_member)
+    bot = commands.Bot(command_prefix='!', intents=intents,
+                       chunk_guilds_at_startup=not LEAN_GATEWAY_MODE,
+                       member_cache_flags=member_cache_flags(intents, LEAN_GATEWAY_MODE))
+    bot.add_listener(remember_interaction_member, 'on_interaction')
+    bot.add_command(hello)
+    bot.add_command(reload_cog)
+
+    # --- Evento on_ready ---
+    @bot.event
+    async def on_ready():
+        logger.info('Bot conectado como %s (%s)', bot.user.name, bot.user.id)
+
+        # Configura o armazenamento (cria tabelas se não existirem)
+        store.setup()
+        logger.info('Base de dados configurada.')
+
+        # Carrega cogs
+        if not os.path.exists(COGS_FOLDER):
+            logger.error("Pasta '%s' não encontrada. Certifique-se de que seus cogs estão na subpasta 'cogs'.", COGS_FOLDER)
+            return
+
+        for extension in EXTENSIONS:
+            if extension in bot.extensions:
+                continue # Reconexão: já carregado (use !reload para atualizar um cog)
             try:
                 # Carrega a extensão (cog)
-                await bot.load_extension(f'cogs.{filename[:-3]}')
-                print(f'✅ Cog {filename[:-3]} carregado.')
-            except Exception as e:
-                print(f'❌ Erro ao carregar cog {filename[:-3]}: {e}')
+                await bot.load_extension(extension)
+                logger.info('Cog %s carregado.', extension[len('cogs.'):])
+            except Exception:
+                logger.exception('Erro ao carregar cog %s.', extension[len('cogs.'):])
+
+        logger.info('Todos os cogs foram carregados.')
+
+        # Mede RSS/CPU nos primeiros minutos e compara com a última medição do outro modo (apenas uma vez por processo)
+        global _gateway_report_task
+        if _gateway_report_task is None:
+            logger.info('Gateway em modo %s (intents: %s).', 'lean' if LEAN_GATEWAY_MODE else 'completo',
+                        ', '.join(name for name, enabled in bot.intents if enabled))
+            _gateway_report_task = asyncio.create_task(report_gateway_usage(bot, LEAN_GATEWAY_MODE))
 
-    print('🚀 Todos os cogs foram carregados.')
-    print('------') 
+        # IMPORTANTE: Se você planeja usar Slash Commands (comandos de aplicação),
+        # descomente a linha abaixo para sincronizá-los com o Discord.
+        # Isto geralmente é feito APENAS uma vez após grandes mudanças nos slash commands.
+        # await bot.tree.sync() # Sincroniza a árvore de comandos de aplicação
 
-    # IMPORTANTE: Se você planeja usar Slash Commands (comandos de aplicação),
-    # descomente a linha abaixo para sincronizá-los com o Discord.
-    # Isto geralmente é feito APENAS uma vez após grandes mudanças nos slash commands.
-    # await bot.tree.sync() # Sincroniza a árvore de comandos de aplicação
+    return bot
 
 # --- Executa o bot ---
 if __name__ == '__main__':
+    # Só o processo do bot configura o logging: os processos 'spawn' dos pools de relatórios também
+    # executam este módulo (como __mp_main__) e não devem abrir o bot.log nem a sua própria thread de escrita.
+    setup_logging()
     # Certifique-se de que seu DISCORD_BOT_TOKEN está configurado nas variáveis de ambiente
     if TOKEN is None:
-        print("ERRO: DISCORD_BOT_TOKEN não encontrado nas variáveis de ambiente.")
-        print("Por favor, defina a variável de ambiente DISCORD_BOT_TOKEN com o token do seu bot.")
+        logger.critical("DISCORD_BOT_TOKEN não encontrado nas variáveis de ambiente. "
+                        "Por favor, defina a variável de ambiente DISCORD_BOT_TOKEN com o token do seu bot.")
     else:
-        bot.run(TOKEN)
+        # O logging já está configurado (setup_logging): desativa o handler próprio do discord.py
+        create_bot().run(TOKEN, log_handler=None)
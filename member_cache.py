@@ -0,0 +1,41 @@
+from datetime import datetime
+
+# Camada de armazenamento (backend escolhido no config.py)
+from storage import store
+
+class MemberNameCache:
+    """
+    Cache write-behind dos nomes de exibição dos membros.
+    As alterações (on_member_update, cliques nos botões) ficam em memória e são gravadas
+    na tabela 'members' em lote por flush(), em vez de uma escrita por evento.
+    """
+    def __init__(self):
+        self._known = {} # user_id -> último nome conhecido (evita regravar nomes iguais)
+        self._pending = {} # user_id -> (display_name, updated_at) ainda por gravar
+
+    def note(self, user_id: int, display_name: str):
+        """Regista o nome atual de um membro; só fica pendente se tiver mudado."""
+        if self._known.get(user_id) == display_name:
+            return
+        self._known[user_id] = display_name
+        self._pending[user_id] = (display_name, datetime.now())
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Grava todos os nomes pendentes num único upsert. Retorna quantos foram gravados."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            store.upsert_members([(user_id, name, updated_at) for user_id, (name, updated_at) in pending.items()])
+        except Exception:
+            # Devolve as alterações à fila (sem sobrepor nomes mais recentes entretanto registados)
+            for user_id, entry in pending.items():
+                self._pending.setdefault(user_id, entry)
+            raise
+        return len(pending)
+
+# Instância partilhada pelos cogs
+member_names = MemberNameCache()
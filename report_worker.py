@@ -0,0 +1,187 @@
+"""
+Funções de relatório executadas num processo separado (ProcessPoolExecutor).
+Não usam o discord nem tocam no loop de eventos: leem a base de dados por uma conexão
+apenas de leitura (snapshot WAL), agregam em Python e preparam os campos da embed em texto.
+(O discord.py é importado indiretamente, via database -> config, uma vez por processo no arranque.)
+"""
+import io
+import logging
+import os
+import signal
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+try:
+    import resource # Apenas Unix: usado para limitar o tempo de CPU de cada gráfico
+except ImportError:
+    resource = None
+
+# Importa funções do nosso módulo database
+from database import get_punches_for_period
+
+logger = logging.getLogger(__name__)
+
+# Limite de caracteres do valor de um campo de embed do Discord
+EMBED_FIELD_LIMIT = 1024
+# Prioridade (nice) dos processos de relatório: em máquinas com poucos CPUs, o bot ganha sempre o CPU
+REPORT_WORKER_NICE = 10
+
+def init_report_worker():
+    """Inicializador do pool: baixa a prioridade do processo de relatórios (onde suportado)."""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(REPORT_WORKER_NICE)
+        except OSError:
+            pass
+
+def aggregate_records(records) -> list:
+    """
+    Soma o tempo em serviço por utilizador nos registos dados.
+    Retorna uma lista [(user_id, username, total_seconds)] ordenada do maior para o menor.
+    """
+    user_total_times = {}
+
+    for record in records:
+        user_id = record['user_id']
+        punch_in = datetime.fromisoformat(record['punch_in_time'])
+        punch_out = datetime.fromisoformat(record['punch_out_time'])
+
+        entry = user_total_times.setdefault(user_id, [record['username'], 0.0])
+        entry[1] += (punch_out - punch_in).total_seconds()
+
+    # Ordena os utilizadores pelo tempo total em serviço (do maior para o menor)
+    totals = [(user_id, username, total_seconds) for user_id, (username, total_seconds) in user_total_times.items()]
+    return sorted(totals, key=lambda item: item[2], reverse=True)
+
+def aggregate_daily(records) -> dict:
+    """Soma o tempo em serviço de todos os utilizadores por dia de entrada: {dia ISO: segundos}."""
+    daily_totals = {}
+    for record in records:
+        punch_in = datetime.fromisoformat(record['punch_in_time'])
+        seconds = (datetime.fromisoformat(record['punch_out_time']) - punch_in).total_seconds()
+        day = punch_in.date().isoformat()
+        daily_totals[day] = daily_totals.get(day, 0.0) + seconds
+    return daily_totals
+
+def build_report_fields(sorted_users: list) -> list:
+    """
+    Prepara os campos da embed do relatório: [(nome do campo, valor)],
+    dividindo a lista de membros em partes que respeitem o limite de 1024 caracteres.
+    """
+    fields = []
+    current_field_value = ""
+
+    for i, (user_id, username, total_seconds) in enumerate(sorted_users):
+        hours, remainder = divmod(int(total_seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        formatted_total_time = f"{hours}h {minutes}m {seconds}s"
+
+        # Linha para o relatório
+        line = f"**{i+1}. {username}** (`{user_id}`)\nTempo Total: `{formatted_total_time}`"
+
+        # Verifica se a linha atual e o separador excederão o limite do campo
+        if len(current_field_value) + len(line) + 1 > EMBED_FIELD_LIMIT and current_field_value:
+            fields.append(current_field_value)
+            current_field_value = line
+        elif current_field_value:
+            current_field_value += "\n" + line
+        else:
+            current_field_value = line
+
+    # Adiciona o último campo (se não estiver vazio)
+    if current_field_value:
+        fields.append(current_field_value)
+
+    if len(fields) == 1: # Se tudo coube em um único campo
+        return [("Membros em Serviço", fields[0])]
+    return [(f"Membros em Serviço (parte {i + 1})", value) for i, value in enumerate(fields)]
+
+def summarize_records(records) -> tuple[list, list, dict]:
+    """Retorna (utilizadores ordenados, campos da embed, totais por dia) a partir dos registos do período."""
+    sorted_users = aggregate_records(records)
+    return sorted_users, build_report_fields(sorted_users), aggregate_daily(records)
+
+def compute_report(db_path: str, start_of_period: datetime, end_of_period: datetime) -> tuple[list, list, dict]:
+    """Ponto de entrada do processo de relatórios (backend SQLite): lê o período e resume-o."""
+    return summarize_records(get_punches_for_period(start_of_period, end_of_period, db_path=db_path))
+
+# --- Gráficos do relatório semanal ---
+
+# Número máximo de agentes no gráfico de barras (os restantes ficam apenas na embed)
+CHART_MAX_OFFICERS = 25
+
+class ChartBudgetExceeded(Exception):
+    """O gráfico excedeu o orçamento de tempo de CPU."""
+
+def _raise_budget_exceeded(signum, frame):
+    raise ChartBudgetExceeded()
+
+@contextmanager
+def cpu_time_budget(seconds: int):
+    """
+    Limita o tempo de CPU do bloco via RLIMIT_CPU: ao exceder, o SIGXCPU interrompe-o com ChartBudgetExceeded.
+    O limite é relativo ao CPU já gasto pelo processo do pool e é reposto no fim.
+    """
+    if resource is None or not hasattr(signal, "SIGXCPU"):
+        yield # Sem suporte (ex.: Windows): apenas o timeout do lado do bot se aplica
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    previous_handler = signal.signal(signal.SIGXCPU, _raise_budget_exceeded)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        signal.signal(signal.SIGXCPU, previous_handler)
+
+def render_weekly_chart(sorted_users: list, daily_totals: dict, start_day: date, end_day: date, cpu_budget_seconds: int) -> bytes | None:
+    """
+    Desenha (PNG) um gráfico de barras das horas por agente e a tendência diária do período.
+    Corre no pool de processos; retorna None se o matplotlib não estiver instalado
+    ou se o orçamento de CPU for excedido.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg") # Sem interface gráfica
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return None
+
+    try:
+        with cpu_time_budget(cpu_budget_seconds):
+            officers = sorted_users[:CHART_MAX_OFFICERS]
+            days = []
+            day = start_day
+            while day <= end_day:
+                days.append(day)
+                day += timedelta(days=1)
+
+            figure, (bars_axis, trend_axis) = plt.subplots(2, 1, figsize=(10, 9), gridspec_kw={'height_ratios': [3, 2]})
+            try:
+                names = [username for _, username, _ in officers][::-1]
+                hours = [total_seconds / 3600 for _, _, total_seconds in officers][::-1]
+                bars_axis.barh(names, hours, color="#32cd32")
+                bars_axis.set_xlabel("Horas")
+                bars_axis.set_title(f"Horas de serviço por agente ({start_day.strftime('%d/%m/%Y')} - {end_day.strftime('%d/%m/%Y')})")
+
+                trend_axis.plot([d.strftime('%d/%m') for d in days],
+                                [daily_totals.get(d.isoformat(), 0.0) / 3600 for d in days],
+                                marker="o", color="#1e90ff")
+                trend_axis.set_ylim(bottom=0)
+                trend_axis.set_ylabel("Horas (total)")
+                trend_axis.set_title("Tendência diária")
+                trend_axis.grid(alpha=0.3)
+
+                figure.tight_layout()
+                buffer = io.BytesIO()
+                figure.savefig(buffer, format="png", dpi=100)
+                return buffer.getvalue()
+            finally:
+                plt.close(figure)
+    except ChartBudgetExceeded:
+        logger.warning("Gráfico do relatório excedeu o orçamento de %ss de CPU e foi descartado.", cpu_budget_seconds)
+        return None
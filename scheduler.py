@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+# Camada de armazenamento (backend escolhido no config.py)
+from storage import store
+# Importa configurações do nosso módulo config
+from config import SCHEDULER_MAX_CATCHUP_RUNS
+
+logger = logging.getLogger(__name__)
+
+class WeeklyRule:
+    """
+    Regra do tipo cron: "todas as <dia da semana> às HH:MM" em hora local.
+    weekday segue datetime.weekday(): 0 = segunda-feira ... 6 = domingo.
+    """
+    def __init__(self, weekday: int, hour: int, minute: int):
+        self.weekday = weekday
+        self.hour = hour
+        self.minute = minute
+
+    def previous(self, moment: datetime) -> datetime:
+        """Retorna a última ocorrência da regra que seja <= moment."""
+        candidate = moment - timedelta(days=(moment.weekday() - self.weekday) % 7)
+        candidate = candidate.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if candidate > moment:
+            candidate -= timedelta(days=7)
+        return candidate
+
+    def next(self, moment: datetime) -> datetime:
+        """Retorna a primeira ocorrência da regra estritamente posterior a moment."""
+        return self.previous(moment) + timedelta(days=7)
+
+    def __repr__(self):
+        return f"WeeklyRule(weekday={self.weekday}, {self.hour:02d}:{self.minute:02d})"
+
+class DailyRule:
+    """Regra do tipo cron: "todos os dias às HH:MM" em hora local."""
+    def __init__(self, hour: int, minute: int):
+        self.hour = hour
+        self.minute = minute
+
+    def previous(self, moment: datetime) -> datetime:
+        """Retorna a última ocorrência da regra que seja <= moment."""
+        candidate = moment.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if candidate > moment:
+            candidate -= timedelta(days=1)
+        return candidate
+
+    def next(self, moment: datetime) -> datetime:
+        """Retorna a primeira ocorrência da regra estritamente posterior a moment."""
+        return self.previous(moment) + timedelta(days=1)
+
+    def __repr__(self):
+        return f"DailyRule({self.hour:02d}:{self.minute:02d})"
+
+class ScheduledJob:
+    """
+    Uma tarefa persistente. 'callback(run_time)' faz a entrega; 'prepare(run_time)' (opcional)
+    é lançado em segundo plano 'prepare_lead' antes da entrega para pré-calcular o resultado.
+    """
+    def __init__(self, name: str, rule: WeeklyRule | DailyRule, callback, prepare=None, prepare_lead: timedelta = timedelta(0)):
+        self.name = name
+        self.rule = rule
+        self.callback = callback
+        self.prepare = prepare
+        self.prepare_lead = prepare_lead
+        self._watermark = None # Última execução reivindicada (cópia em memória da base de dados)
+        self._prepared_for = None # Execução para a qual a preparação já foi lançada
+        self._prepare_task = None
+
+    def next_run(self) -> datetime | None:
+        """Próxima execução prevista (None se a marca ainda não foi carregada)."""
+        return self.rule.next(self._watermark) if self._watermark else None
+
+class JobScheduler:
+    """
+    Agendador de tarefas com marca da última execução guardada no armazenamento (tabela 'scheduled_jobs').
+    - Entrega no máximo uma vez: a marca é avançada atomicamente antes de chamar o callback.
+    - Recupera execuções perdidas enquanto o bot estava desligado (até max_catchup_runs).
+    - Não toca na base de dados enquanto nenhuma tarefa estiver para vencer.
+    """
+    def __init__(self, max_catchup_runs: int = SCHEDULER_MAX_CATCHUP_RUNS):
+        self.max_catchup_runs = max(1, max_catchup_runs)
+        self.jobs = {}
+
+    def add_job(self, job: ScheduledJob):
+        self.jobs[job.name] = job
+
+    def export_state(self) -> dict:
+        """Marca e preparação em curso de cada tarefa, para entregar a outro agendador (ex.: !reload)."""
+        return {name: (job._watermark, job._prepared_for, job._prepare_task) for name, job in self.jobs.items()}
+
+    def import_state(self, state: dict):
+        """Adota o estado exportado por outro agendador, para as tarefas com o mesmo nome."""
+        for name, (watermark, prepared_for, prepare_task) in state.items():
+            job = self.jobs.get(name)
+            if job is not None:
+                job._watermark, job._prepared_for, job._prepare_task = watermark, prepared_for, prepare_task
+
+    async def run_pending(self, now: datetime = None):
+        """Deve ser chamada periodicamente; executa/prepara o que estiver vencido."""
+        now = now or datetime.now()
+        for job in self.jobs.values():
+            try:
+                await self._run_job_pending(job, now)
+            except Exception:
+                logger.exception("Erro no agendador ao processar a tarefa '%s'.", job.name)
+
+    async def _run_job_pending(self, job: ScheduledJob, now: datetime):
+        if job._watermark is None:
+            # Primeira vez: se a tarefa nunca correu, começa a contar a partir da última ocorrência
+            # (não publica imediatamente no primeiro arranque).
+            job._watermark = store.init_job_watermark(job.name, job.rule.previous(now))
+            logger.info("Tarefa agendada '%s' (%s) carregada. Próxima execução: %s", job.name, job.rule, job.next_run().strftime('%d/%m/%Y %H:%M'))
+
+        next_run = job.next_run()
+
+        # Pré-cálculo em segundo plano pouco antes da entrega
+        if job.prepare and job._prepared_for != next_run and next_run - job.prepare_lead <= now < next_run:
+            job._prepared_for = next_run
+            job._prepare_task = asyncio.create_task(job.prepare(next_run))
+
+        if next_run > now:
+            return
+
+        # Lista as execuções vencidas (recuperação após o bot ter estado desligado)
+        due_runs = []
+        run_time = next_run
+        while run_time <= now:
+            due_runs.append(run_time)
+            run_time = job.rule.next(run_time)
+
+        if len(due_runs) > self.max_catchup_runs:
+            skipped = due_runs[:-self.max_catchup_runs]
+            due_runs = due_runs[-self.max_catchup_runs:]
+            logger.warning("%d execuções antigas de '%s' ignoradas (limite de recuperação: %d).", len(skipped), job.name, self.max_catchup_runs)
+            if not self._claim(job, skipped[-1]):
+                return
+
+        for run_time in due_runs:
+            if not self._claim(job, run_time):
+                return
+            if job._prepare_task and job._prepared_for == run_time:
+                # Espera pela preparação, se ainda estiver a correr, para não calcular duas vezes
+                await asyncio.gather(job._prepare_task, return_exceptions=True)
+                job._prepare_task = None
+            logger.info("Executando tarefa agendada '%s' para %s.", job.name, run_time.strftime('%d/%m/%Y %H:%M'))
+            try:
+                await job.callback(run_time)
+            except Exception:
+                # A execução já foi reivindicada: não será repetida (entrega no máximo uma vez).
+                logger.exception("Erro ao executar a tarefa agendada '%s' (%s).", job.name, run_time.strftime('%d/%m/%Y %H:%M'))
+
+    def _claim(self, job: ScheduledJob, run_time: datetime) -> bool:
+        """Avança a marca da tarefa; se outra instância já o fez, recarrega a marca."""
+        if store.claim_job_run(job.name, job._watermark, run_time):
+            job._watermark = run_time
+            return True
+        job._watermark = store.get_job_last_run(job.name)
+        logger.info("Execução de '%s' para %s já tinha sido reivindicada.", job.name, run_time.strftime('%d/%m/%Y %H:%M'))
+        return False
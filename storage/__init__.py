@@ -0,0 +1,25 @@
+"""
+Camada de armazenamento: os cogs usam 'store' em vez de importar o módulo database diretamente.
+O backend é escolhido por STORAGE_BACKEND no config.py.
+"""
+from config import STORAGE_BACKEND
+
+from storage.base import PunchStore, TicketStore, JobStore
+from storage.sqlite_store import SqliteStore
+from storage.memory_store import MemoryStore
+
+# Backends disponíveis (nome em STORAGE_BACKEND -> classe)
+BACKENDS = {
+    'sqlite': SqliteStore,
+    'memory': MemoryStore,
+}
+
+def create_store(backend: str = None):
+    """Cria uma instância do backend indicado (por defeito, o configurado em STORAGE_BACKEND)."""
+    backend = (backend or STORAGE_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de armazenamento desconhecido: '{backend}'. Opções: {', '.join(BACKENDS)}")
+    return BACKENDS[backend]()
+
+# Instância partilhada pelos cogs
+store = create_store()
@@ -0,0 +1,41 @@
+from datetime import date, datetime, timedelta
+from typing import Protocol, runtime_checkable
+
+# Os registos devolvidos suportam acesso por nome de coluna (record['user_id']),
+# seja um sqlite3.Row (SQLite) ou um dict (memória).
+
+@runtime_checkable
+class PunchStore(Protocol):
+    """Operações de picagem de ponto, índice de horas e nomes de membros."""
+
+    def setup(self) -> None:
+        """Prepara o armazenamento (tabelas, migrações, índices)."""
+
+    def record_punch_in(self, user_id: int) -> bool: ...
+    def record_punch_ins(self, user_ids: list[int]) -> dict[int, bool]: ...
+    def record_punch_out(self, user_id: int) -> tuple[bool, timedelta | None]: ...
+    def record_punch_outs(self, user_ids: list[int]) -> dict[int, tuple[bool, timedelta | None]]: ...
+    def get_punches_for_period(self, start_time: datetime, end_time: datetime) -> list: ...
+    def get_open_punches_for_auto_close(self) -> list: ...
+    def auto_record_punch_out(self, punch_id: int, auto_punch_out_time: datetime) -> None: ...
+    def auto_record_punch_outs(self, punch_outs: list[tuple[int, datetime]]) -> None: ...
+    def get_active_punch_start(self, user_id: int) -> datetime | None: ...
+    def get_duty_seconds(self, user_id: int, start_day: date, end_day: date) -> float: ...
+    def upsert_members(self, members: list[tuple[int, str, datetime]]) -> None: ...
+
+@runtime_checkable
+class TicketStore(Protocol):
+    """Operações do sistema de tickets."""
+
+    def add_ticket_to_db(self, channel_id: int, creator_id: int, creator_name: str, category: str) -> bool: ...
+    def add_tickets_to_db(self, tickets: list[tuple[int, int, str, str]]) -> list[bool]: ...
+    def remove_ticket_from_db(self, channel_id: int) -> None: ...
+    def get_all_open_tickets(self) -> list[dict]: ...
+
+@runtime_checkable
+class JobStore(Protocol):
+    """Marca da última execução das tarefas agendadas."""
+
+    def get_job_last_run(self, job_name: str) -> datetime | None: ...
+    def init_job_watermark(self, job_name: str, last_run_time: datetime) -> datetime: ...
+    def claim_job_run(self, job_name: str, expected_last_run: datetime, run_time: datetime) -> bool: ...
@@ -0,0 +1,134 @@
+"""
+Suite de conformidade dos backends de armazenamento.
+As mesmas verificações correm contra todas as implementações (SQLite num ficheiro temporário e memória),
+garantindo que têm exatamente a mesma semântica.
+
+Uso:
+    python -m storage.conformance
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import database
+from storage import BACKENDS, PunchStore, TicketStore, JobStore
+
+def check_protocols(store):
+    assert isinstance(store, PunchStore)
+    assert isinstance(store, TicketStore)
+    assert isinstance(store, JobStore)
+
+def check_punch_in_out(store):
+    assert store.record_punch_in(1) is True
+    assert store.record_punch_in(1) is False # Já está em serviço
+    assert store.get_active_punch_start(1) is not None
+    success, duration = store.record_punch_out(1)
+    assert success is True and isinstance(duration, timedelta)
+    assert store.record_punch_out(1) == (False, None) # Já não está em serviço
+    assert store.get_active_punch_start(1) is None
+
+def check_batch_punches(store):
+    assert store.record_punch_ins([2, 3]) == {2: True, 3: True}
+    assert store.record_punch_ins([2]) == {2: False} # Já está em serviço
+    results = store.record_punch_outs([2, 3, 4])
+    assert results[2][0] is True and results[3][0] is True and results[4] == (False, None)
+
+def check_open_punches_and_auto_close(store):
+    store.record_punch_in(10)
+    store.record_punch_in(11)
+    open_punches = {punch['user_id']: punch for punch in store.get_open_punches_for_auto_close()}
+    assert set(open_punches) >= {10, 11}
+    assert open_punches[10]['username'] == '10' # Sem membro conhecido, usa o id
+
+    close_at = datetime.fromisoformat(open_punches[10]['punch_in_time']) + timedelta(hours=2)
+    store.auto_record_punch_out(open_punches[10]['id'], close_at)
+    store.auto_record_punch_out(open_punches[10]['id'], close_at + timedelta(hours=5)) # Já fechado: ignorado
+    store.auto_record_punch_outs([(open_punches[11]['id'], close_at)])
+    remaining = {punch['user_id'] for punch in store.get_open_punches_for_auto_close()}
+    assert 10 not in remaining and 11 not in remaining
+
+    today = datetime.fromisoformat(open_punches[10]['punch_in_time']).date()
+    assert abs(store.get_duty_seconds(10, today, today) - 7200) < 1
+    assert store.get_duty_seconds(10, today - timedelta(days=7), today - timedelta(days=1)) == 0
+    assert store.get_duty_seconds(999, today, today) == 0
+
+def check_period_query_and_members(store):
+    store.record_punch_in(20)
+    store.record_punch_out(20)
+    store.record_punch_in(21) # Aberto: não entra no relatório
+    now = datetime.now()
+    store.upsert_members([(20, "Novo Nome", now)])
+    store.upsert_members([(20, "Nome Antigo", now - timedelta(days=1))]) # Mais antigo: ignorado
+
+    records = store.get_punches_for_period(now - timedelta(days=1), now)
+    by_user = {}
+    for record in records:
+        by_user.setdefault(record['user_id'], []).append(record)
+    assert 21 not in by_user
+    assert by_user[20][0]['username'] == "Novo Nome"
+    punch_in_times = [record['punch_in_time'] for record in records]
+    assert punch_in_times == sorted(punch_in_times) # Ordenado por hora de entrada
+    assert list(store.get_punches_for_period(now - timedelta(days=30), now - timedelta(days=2))) == []
+
+def check_tickets(store):
+    assert store.add_ticket_to_db(500, 1, "Criador", "Suporte Geral") is True
+    assert store.add_ticket_to_db(500, 2, "Outro", "Suporte Geral") is False # Canal único
+    assert store.add_tickets_to_db([(501, 1, "Criador", "RH"), (500, 1, "Criador", "RH")]) == [True, False]
+    tickets = {ticket['channel_id']: ticket for ticket in store.get_all_open_tickets()}
+    assert set(tickets) == {500, 501}
+    assert tickets[501]['category'] == "RH" and tickets[500]['creator_name'] == "Criador"
+    store.remove_ticket_from_db(500)
+    store.remove_ticket_from_db(12345) # Inexistente: sem erro
+    assert [ticket['channel_id'] for ticket in store.get_all_open_tickets()] == [501]
+
+def check_job_watermarks(store):
+    first = datetime(2025, 1, 6, 0, 5)
+    assert store.get_job_last_run("job") is None
+    assert store.init_job_watermark("job", first) == first
+    assert store.init_job_watermark("job", first + timedelta(days=7)) == first # A existente prevalece
+    assert store.claim_job_run("job", first, first + timedelta(days=7)) is True
+    assert store.claim_job_run("job", first, first + timedelta(days=7)) is False # Já reivindicada
+    assert store.get_job_last_run("job") == first + timedelta(days=7)
+
+CHECKS = [
+    check_protocols,
+    check_punch_in_out,
+    check_batch_punches,
+    check_open_punches_and_auto_close,
+    check_period_query_and_members,
+    check_tickets,
+    check_job_watermarks,
+]
+
+def run_conformance(backend: str) -> list:
+    """Corre todas as verificações num backend novo e vazio. Retorna a lista de falhas."""
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_database = database.DATABASE_NAME
+        database.DATABASE_NAME = os.path.join(tmp_dir, "conformance.db") # Nunca toca no punch_card.db real
+        try:
+            store = BACKENDS[backend]()
+            store.setup()
+            for check in CHECKS:
+                try:
+                    check(store)
+                except Exception as e:
+                    failures.append(f"{check.__name__}: {type(e).__name__} {e}")
+        finally:
+            database.DATABASE_NAME = original_database
+    return failures
+
+def main():
+    all_ok = True
+    for backend in BACKENDS:
+        failures = run_conformance(backend)
+        status = "✅" if not failures else "❌"
+        print(f"{status} {backend}: {len(CHECKS) - len(failures)}/{len(CHECKS)} verificações passaram.")
+        for failure in failures:
+            print(f"   - {failure}")
+        all_ok = all_ok and not failures
+    sys.exit(0 if all_ok else 1)
+
+if __name__ == '__main__':
+    main()
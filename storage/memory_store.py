@@ -0,0 +1,177 @@
+import bisect
+import threading
+from datetime import datetime, timedelta
+
+class MemoryStore:
+    """
+    Implementação em memória (dicts e listas ordenadas), sem disco.
+    Útil para testes e benchmarks; os dados perdem-se quando o processo termina.
+    Segue a mesma semântica da implementação SQLite (ver storage.conformance).
+    """
+    db_path = None # Não há ficheiro: os relatórios correm no próprio processo
+
+    def __init__(self):
+        self._lock = threading.RLock() # Os relatórios podem ler a partir de outra thread
+        self.setup()
+
+    def setup(self):
+        with self._lock:
+            if getattr(self, "_punches", None) is not None:
+                return # Já preparado (como CREATE TABLE IF NOT EXISTS)
+            self._next_punch_id = 1
+            self._punches = {} # punch_id -> registo
+            self._open_by_user = {} # user_id -> punch_id do ponto aberto
+            self._by_punch_in = [] # [(punch_in_time ISO, punch_id)] ordenada, para consultas por período
+            self._members = {} # user_id -> {'display_name', 'updated_at'}
+            self._duty_days = {} # user_id -> [dia ISO] ordenada
+            self._duty_totals = {} # user_id -> {dia ISO: [segundos, acumulado]}
+            self._tickets = {} # channel_id -> registo (ordem de inserção)
+            self._jobs = {} # job_name -> datetime da última execução
+
+    def _username(self, user_id: int) -> str:
+        member = self._members.get(user_id)
+        return member['display_name'] if member else str(user_id)
+
+    def _add_duty_seconds(self, user_id: int, punch_in_time: datetime, seconds: float):
+        day = punch_in_time.date().isoformat()
+        days = self._duty_days.setdefault(user_id, [])
+        totals = self._duty_totals.setdefault(user_id, {})
+        index = bisect.bisect_left(days, day)
+        if index < len(days) and days[index] == day:
+            totals[day][0] += seconds
+        else:
+            previous = totals[days[index - 1]][1] if index > 0 else 0.0
+            days.insert(index, day)
+            totals[day] = [seconds, previous]
+        # Atualiza a soma acumulada do dia e dos dias seguintes
+        for later_day in days[index:]:
+            totals[later_day][1] += seconds
+
+    def _cumulative_until(self, user_id: int, day: str) -> float:
+        days = self._duty_days.get(user_id, [])
+        index = bisect.bisect_right(days, day) - 1
+        return self._duty_totals[user_id][days[index]][1] if index >= 0 else 0.0
+
+    # --- Ponto ---
+    def record_punch_in(self, user_id):
+        with self._lock:
+            if user_id in self._open_by_user:
+                return False # Usuário já está em serviço
+            punch_id = self._next_punch_id
+            self._next_punch_id += 1
+            punch_in_time = datetime.now().isoformat()
+            self._punches[punch_id] = {'id': punch_id, 'user_id': user_id, 'punch_in_time': punch_in_time, 'punch_out_time': None}
+            self._open_by_user[user_id] = punch_id
+            bisect.insort(self._by_punch_in, (punch_in_time, punch_id))
+            return True
+
+    def record_punch_ins(self, user_ids):
+        with self._lock:
+            return {user_id: self.record_punch_in(user_id) for user_id in user_ids}
+
+    def _close_punch(self, punch_id: int, punch_out_time: datetime) -> timedelta:
+        punch = self._punches[punch_id]
+        punch['punch_out_time'] = punch_out_time.isoformat()
+        del self._open_by_user[punch['user_id']]
+        punch_in_time = datetime.fromisoformat(punch['punch_in_time'])
+        duration = punch_out_time - punch_in_time
+        self._add_duty_seconds(punch['user_id'], punch_in_time, duration.total_seconds())
+        return duration
+
+    def record_punch_out(self, user_id):
+        with self._lock:
+            punch_id = self._open_by_user.get(user_id)
+            if punch_id is None:
+                return False, None
+            return True, self._close_punch(punch_id, datetime.now())
+
+    def record_punch_outs(self, user_ids):
+        with self._lock:
+            return {user_id: self.record_punch_out(user_id) for user_id in user_ids}
+
+    def get_punches_for_period(self, start_time, end_time):
+        # Garante que a end_time inclua todo o último dia (até o último microssegundo)
+        adjusted_end_time = end_time.replace(hour=23, minute=59, second=59, microsecond=999999).isoformat()
+        with self._lock:
+            low = bisect.bisect_left(self._by_punch_in, (start_time.isoformat(),))
+            high = bisect.bisect_right(self._by_punch_in, (adjusted_end_time, float('inf')))
+            records = []
+            for _, punch_id in self._by_punch_in[low:high]:
+                punch = self._punches[punch_id]
+                if punch['punch_out_time'] is None:
+                    continue # Apenas registros completos (com entrada e saída)
+                records.append({'user_id': punch['user_id'], 'username': self._username(punch['user_id']),
+                                'punch_in_time': punch['punch_in_time'], 'punch_out_time': punch['punch_out_time']})
+            return records
+
+    def get_open_punches_for_auto_close(self):
+        with self._lock:
+            return [{'id': punch_id, 'user_id': user_id, 'username': self._username(user_id),
+                     'punch_in_time': self._punches[punch_id]['punch_in_time']}
+                    for user_id, punch_id in self._open_by_user.items()]
+
+    def auto_record_punch_out(self, punch_id, auto_punch_out_time):
+        with self._lock:
+            punch = self._punches.get(punch_id)
+            if punch and punch['punch_out_time'] is None:
+                self._close_punch(punch_id, auto_punch_out_time)
+
+    def auto_record_punch_outs(self, punch_outs):
+        with self._lock:
+            for punch_id, auto_punch_out_time in punch_outs:
+                self.auto_record_punch_out(punch_id, auto_punch_out_time)
+
+    def get_active_punch_start(self, user_id):
+        with self._lock:
+            punch_id = self._open_by_user.get(user_id)
+            return datetime.fromisoformat(self._punches[punch_id]['punch_in_time']) if punch_id else None
+
+    def get_duty_seconds(self, user_id, start_day, end_day):
+        with self._lock:
+            total = self._cumulative_until(user_id, end_day.isoformat()) - self._cumulative_until(user_id, (start_day - timedelta(days=1)).isoformat())
+            return max(0.0, total)
+
+    def upsert_members(self, members):
+        with self._lock:
+            for user_id, display_name, updated_at in members:
+                current = self._members.get(user_id)
+                # Um nome mais antigo nunca substitui um mais recente
+                if current is None or updated_at >= current['updated_at']:
+                    self._members[user_id] = {'display_name': display_name, 'updated_at': updated_at}
+
+    # --- Tickets ---
+    def add_ticket_to_db(self, channel_id, creator_id, creator_name, category):
+        with self._lock:
+            if channel_id in self._tickets:
+                return False
+            self._tickets[channel_id] = {'channel_id': channel_id, 'creator_id': creator_id, 'creator_name': creator_name,
+                                         'category': category, 'created_at': datetime.now().isoformat()}
+            return True
+
+    def add_tickets_to_db(self, tickets):
+        with self._lock:
+            return [self.add_ticket_to_db(*ticket) for ticket in tickets]
+
+    def remove_ticket_from_db(self, channel_id):
+        with self._lock:
+            self._tickets.pop(channel_id, None)
+
+    def get_all_open_tickets(self):
+        with self._lock:
+            return [dict(ticket) for ticket in self._tickets.values()]
+
+    # --- Tarefas agendadas ---
+    def get_job_last_run(self, job_name):
+        with self._lock:
+            return self._jobs.get(job_name)
+
+    def init_job_watermark(self, job_name, last_run_time):
+        with self._lock:
+            return self._jobs.setdefault(job_name, last_run_time)
+
+    def claim_job_run(self, job_name, expected_last_run, run_time):
+        with self._lock:
+            if self._jobs.get(job_name) != expected_last_run:
+                return False
+            self._jobs[job_name] = run_time
+            return True
@@ -0,0 +1,70 @@
+import database
+
+class SqliteStore:
+    """
+    Implementação SQLite: delega nas funções do módulo database (ficheiro DATABASE_NAME).
+    'db_path' é exposto para que os relatórios pesados possam abrir a base de dados noutro processo.
+    """
+    @property
+    def db_path(self) -> str:
+        return database.DATABASE_NAME
+
+    def setup(self):
+        database.setup_database()
+
+    # --- Ponto ---
+    def record_punch_in(self, user_id):
+        return database.record_punch_in(user_id)
+
+    def record_punch_ins(self, user_ids):
+        return database.record_punch_ins(user_ids)
+
+    def record_punch_out(self, user_id):
+        return database.record_punch_out(user_id)
+
+    def record_punch_outs(self, user_ids):
+        return database.record_punch_outs(user_ids)
+
+    def get_punches_for_period(self, start_time, end_time):
+        return database.get_punches_for_period(start_time, end_time, db_path=self.db_path)
+
+    def get_open_punches_for_auto_close(self):
+        return database.get_open_punches_for_auto_close()
+
+    def auto_record_punch_out(self, punch_id, auto_punch_out_time):
+        database.auto_record_punch_out(punch_id, auto_punch_out_time)
+
+    def auto_record_punch_outs(self, punch_outs):
+        database.auto_record_punch_outs(punch_outs)
+
+    def get_active_punch_start(self, user_id):
+        return database.get_active_punch_start(user_id)
+
+    def get_duty_seconds(self, user_id, start_day, end_day):
+        return database.get_duty_seconds(user_id, start_day, end_day)
+
+    def upsert_members(self, members):
+        database.upsert_members(members)
+
+    # --- Tickets ---
+    def add_ticket_to_db(self, channel_id, creator_id, creator_name, category):
+        return database.add_ticket_to_db(channel_id, creator_id, creator_name, category)
+
+    def add_tickets_to_db(self, tickets):
+        return database.add_tickets_to_db(tickets)
+
+    def remove_ticket_from_db(self, channel_id):
+        database.remove_ticket_from_db(channel_id)
+
+    def get_all_open_tickets(self):
+        return database.get_all_open_tickets()
+
+    # --- Tarefas agendadas ---
+    def get_job_last_run(self, job_name):
+        return database.get_job_last_run(job_name)
+
+    def init_job_watermark(self, job_name, last_run_time):
+        return database.init_job_watermark(job_name, last_run_time)
+
+    def claim_job_run(self, job_name, expected_last_run, run_time):
+        return database.claim_job_run(job_name, expected_last_run, run_time)